@@ -0,0 +1,253 @@
+"""剪贴板推送压力测试
+
+模拟构建脚本、远程桌面等程序高速推送剪贴板内容，检查写入队列的背压是否生效：
+统计写入吞吐量、合并/丢弃的数量、界面延迟和内存占用。
+
+    python loadgen.py --rate 500 --duration 10 --size 2K --kind cjk
+    python loadgen.py --rate 5 --size 4M --kind mixed          # 几 MB 的大文本
+    python loadgen.py --mode ipc --rate 200                    # 推送给已经运行的实例
+
+inprocess 模式（默认）在当前进程中创建一个使用临时配置目录的窗口（默认不显示，
+使用 offscreen 平台），直接调用写入入口；界面延迟是主线程定时器的延迟。
+ipc 模式通过本地套接字推送给正在运行的实例，界面延迟是 stats 请求的往返时间
+（请求在对方的主线程中处理）。
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+CJK_CHARS = "剪贴板管理器历史记录搜索固定删除编辑复制粘贴窗口界面测试，。、；：？！“”（）《》"
+ASCII_CHARS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 .,;:-_/\n"
+
+
+def parse_size(text):
+    """解析 100、2K、4M 这样的字符数"""
+    text = text.strip().upper()
+    units = {'K': 1024, 'M': 1024 * 1024}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+class PayloadFactory:
+    """生成指定大小的内容；只随机生成一次基础文本，每条内容加上序号保证不重复"""
+    def __init__(self, size, kind, duplicate_ratio, seed=0):
+        rng = random.Random(seed)
+        if kind == 'ascii':
+            alphabet = ASCII_CHARS
+        elif kind == 'cjk':
+            alphabet = CJK_CHARS
+        else:
+            alphabet = ASCII_CHARS + CJK_CHARS
+        block = ''.join(rng.choice(alphabet) for _ in range(min(size, 64 * 1024)))
+        self.base = (block * (size // len(block) + 1))[:size]
+        self.duplicate_ratio = duplicate_ratio
+        self.rng = rng
+        self.counter = 0
+        self.last = None
+
+    def next(self):
+        if self.last is not None and self.rng.random() < self.duplicate_ratio:
+            return self.last
+        self.counter += 1
+        prefix = f"#{self.counter} "
+        self.last = prefix + self.base[len(prefix):]
+        return self.last
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def latency_summary(values):
+    return {'samples': len(values), 'p50_ms': round(percentile(values, 0.5), 2),
+            'p95_ms': round(percentile(values, 0.95), 2), 'max_ms': round(max(values, default=0.0), 2)}
+
+
+def run_inprocess(args, factory):
+    if not args.show:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    if not os.environ.get('CLIPBOARD_MANAGER_DIR'):
+        os.environ['CLIPBOARD_MANAGER_DIR'] = tempfile.mkdtemp(prefix='clipboard_loadgen_')
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtCore import QTimer
+    app = QApplication(sys.argv[:1])
+    import main
+
+    window = main.ClipboardManager()
+    window.ingest_queue = main.IngestQueue(max_items=args.queue_items, policy=args.policy)
+    window.show()
+    rss_start = main.process_rss()
+    state = {'sent': 0, 'rss_peak': rss_start or 0, 'latencies': [], 'last_beat': None,
+             'start': time.perf_counter(), 'send_end': None, 'drained': None}
+    tick_ms = 10
+
+    def send():
+        elapsed = time.perf_counter() - state['start']
+        if elapsed >= args.duration:
+            state['send_end'] = time.perf_counter()
+            send_timer.stop()
+            return
+        # 按目标速率补齐到当前时间应发送的数量
+        due = int(elapsed * args.rate) + 1 - state['sent']
+        for _ in range(max(0, due)):
+            window.enqueue_clip(factory.next())
+            state['sent'] += 1
+
+    def beat():
+        now = time.perf_counter()
+        if state['last_beat'] is not None:
+            state['latencies'].append(max(0.0, (now - state['last_beat']) * 1000 - tick_ms))
+        state['last_beat'] = now
+        rss = main.process_rss()
+        if rss:
+            state['rss_peak'] = max(state['rss_peak'], rss)
+        worker = window.ingest_worker
+        if (state['send_end'] is not None and not window.ingest_queue
+                and (worker is None or worker.isFinished())):
+            state['drained'] = now
+            app.quit()
+        elif now - state['start'] > args.duration + args.drain_timeout:
+            app.quit()
+
+    send_timer = QTimer()
+    send_timer.timeout.connect(send)
+    send_timer.start(tick_ms)
+    beat_timer = QTimer()
+    beat_timer.timeout.connect(beat)
+    beat_timer.start(tick_ms)
+    app.exec()
+    send_timer.stop()
+    beat_timer.stop()
+
+    stats = window.ingest_queue.stats()
+    end = state['drained'] or time.perf_counter()
+    report = {
+        'mode': 'inprocess',
+        'sent': state['sent'],
+        'send_rate': round(state['sent'] / max(1e-9, (state['send_end'] or end) - state['start']), 1),
+        'ingest': stats,
+        'written_per_s': round(stats['written'] / max(1e-9, end - state['start']), 1),
+        'drained': state['drained'] is not None,
+        'gui_latency': latency_summary(state['latencies']),
+        'rss_mb': {'start': round((rss_start or 0) / 2 ** 20, 1), 'peak': round(state['rss_peak'] / 2 ** 20, 1),
+                   'end': round((main.process_rss() or 0) / 2 ** 20, 1)},
+        'store_count': window.store.count(),
+    }
+    window.close_application()
+    return report
+
+
+def run_ipc(args, factory):
+    from PyQt6.QtCore import QCoreApplication
+    from PyQt6.QtNetwork import QLocalSocket
+    app = QCoreApplication(sys.argv[:1])
+    import main
+
+    socket = QLocalSocket()
+    socket.connectToServer(main.IPC_SERVER_NAME)
+    if not socket.waitForConnected(3000):
+        sys.exit("没有正在运行的实例")
+    buffer = bytearray()
+
+    def request(payload):
+        socket.write(main.encode_ipc_frame(payload))
+        socket.waitForBytesWritten(10000)
+        return main.read_ipc_frame(socket, buffer, 30000)
+
+    before = request({'op': 'stats'})
+    statuses = {'queued': 0, 'coalesced': 0, 'dropped': 0}
+    latencies = []
+    sent = 0
+    start = time.perf_counter()
+    next_probe = start
+    while True:
+        now = time.perf_counter()
+        elapsed = now - start
+        if elapsed >= args.duration:
+            break
+        due = int(elapsed * args.rate) + 1 - sent
+        if due > 0:
+            # 同一时刻应发送的内容合并成一个批量请求
+            responses = request([{'op': 'push', 'text': factory.next()} for _ in range(due)])
+            for response in responses:
+                statuses[response.get('status', 'dropped')] += 1
+            sent += due
+        if now >= next_probe:
+            probe = time.perf_counter()
+            request({'op': 'stats'})
+            latencies.append((time.perf_counter() - probe) * 1000)
+            next_probe = now + 0.1
+        else:
+            time.sleep(0.002)
+    send_end = time.perf_counter()
+    # 等待对方把队列写完
+    after = request({'op': 'stats'})
+    while after['ingest']['depth'] and time.perf_counter() - send_end < args.drain_timeout:
+        time.sleep(0.1)
+        after = request({'op': 'stats'})
+    end = time.perf_counter()
+    socket.disconnectFromServer()
+    app.quit()
+
+    written = after['ingest']['written'] - before['ingest']['written']
+    return {
+        'mode': 'ipc',
+        'sent': sent,
+        'send_rate': round(sent / max(1e-9, send_end - start), 1),
+        'responses': statuses,
+        'ingest': after['ingest'],
+        'written_per_s': round(written / max(1e-9, end - start), 1),
+        'drained': not after['ingest']['depth'],
+        'gui_latency': latency_summary(latencies),
+        'rss_mb': {'start': round((before.get('rss_bytes') or 0) / 2 ** 20, 1),
+                   'end': round((after.get('rss_bytes') or 0) / 2 ** 20, 1)},
+    }
+
+
+def print_report(report):
+    print(f"模式: {report['mode']}")
+    print(f"发送: {report['sent']} 条（{report['send_rate']}/s）")
+    ingest = report['ingest']
+    print(f"队列: 接收 {ingest['accepted']}，合并 {ingest['coalesced']}，丢弃 {ingest['dropped']}，"
+          f"写入 {ingest['written']}（{report['written_per_s']}/s），峰值深度 {ingest['peak_depth']}，"
+          f"{'已写完' if report['drained'] else '未写完'}")
+    latency = report['gui_latency']
+    print(f"界面延迟: p50 {latency['p50_ms']} ms，p95 {latency['p95_ms']} ms，最大 {latency['max_ms']} ms")
+    print("内存(MB): " + "，".join(f"{key} {value}" for key, value in report['rss_mb'].items()))
+
+
+def main_entry(argv=None):
+    parser = argparse.ArgumentParser(description="剪贴板推送压力测试")
+    parser.add_argument('--mode', choices=['inprocess', 'ipc'], default='inprocess')
+    parser.add_argument('--rate', type=float, default=200, help="每秒推送的条数")
+    parser.add_argument('--duration', type=float, default=5, help="推送持续的秒数")
+    parser.add_argument('--size', type=parse_size, default=parse_size('1K'), help="每条内容的字符数，如 100、2K、4M")
+    parser.add_argument('--kind', choices=['ascii', 'cjk', 'mixed'], default='mixed')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.0, help="重复推送上一条内容的比例")
+    parser.add_argument('--policy', choices=['drop_oldest', 'drop_newest'], default='drop_oldest',
+                        help="队列满时的策略（仅 inprocess 模式）")
+    parser.add_argument('--queue-items', type=int, default=500, help="队列最多容纳的条数（仅 inprocess 模式）")
+    parser.add_argument('--drain-timeout', type=float, default=30, help="推送结束后等待写完的最长秒数")
+    parser.add_argument('--show', action='store_true', help="inprocess 模式下显示窗口")
+    parser.add_argument('--json', action='store_true', help="以 JSON 输出结果")
+    args = parser.parse_args(argv)
+
+    factory = PayloadFactory(args.size, args.kind, args.duplicate_ratio)
+    report = run_ipc(args, factory) if args.mode == 'ipc' else run_inprocess(args, factory)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+    return report
+
+
+if __name__ == '__main__':
+    main_entry()
@@ -1,15 +1,311 @@
+import os
+import re
 import sys
 import json
+import base64
+import time
+import math
+import sqlite3
+import struct
+import hashlib
+import getpass
+import logging
+import logging.handlers
+import argparse
+import threading
+import traceback
+import multiprocessing
+import concurrent.futures
+from collections import deque
+from contextlib import contextmanager
 from pathlib import Path
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                            QPushButton, QScrollArea, QLabel, QFrame,
                            QHBoxLayout, QMessageBox, QLineEdit, QMenu,
-                           QInputDialog, QDialog, QPlainTextEdit, QSystemTrayIcon)
-from PyQt6.QtCore import Qt, QTimer, QRect, QPoint, QPropertyAnimation, QEasingCurve, QSize, QPointF
+                           QInputDialog, QDialog, QPlainTextEdit, QSystemTrayIcon,
+                           QButtonGroup)
+from PyQt6.QtCore import (Qt, QTimer, QRect, QRectF, QPoint, QVariantAnimation,
+                          QEasingCurve, QSize, QPointF, QObject, QThread, QFileSystemWatcher, pyqtSignal)
 from PyQt6.QtGui import (QPalette, QColor, QScreen, QPainter, QLinearGradient, 
-                        QPen, QBrush, QPainterPath, QCursor, QRadialGradient, QIcon)
+                        QPen, QBrush, QPainterPath, QCursor, QRadialGradient, QIcon, QPixmap)
+from PyQt6.QtNetwork import QLocalServer, QLocalSocket
 import pyperclip
 
+logger = logging.getLogger("clipboard_manager")
+
+# 本地 IPC 服务名（每个用户、每个显示器一个，用于单实例和外部程序调用）
+# 不同 X 显示器/会话上的实例各自运行，通过共享的历史数据库同步
+_display = os.environ.get('WAYLAND_DISPLAY') or os.environ.get('DISPLAY') or ''
+IPC_SERVER_NAME = f"clipboard_manager-{getpass.getuser()}" + (
+    '-' + ''.join(c if c.isalnum() else '_' for c in _display) if _display else '')
+IPC_MAX_FRAME = 64 * 1024 * 1024  # 单个请求最大 64MB
+
+
+# 默认保留策略：0 表示不限制
+DEFAULT_RETENTION = {
+    'max_count': 1000,               # 最多保留的记录数
+    'max_bytes': 100 * 1024 * 1024,  # 所有记录的总字节数上限
+    'max_age_days': 0,               # 超过天数的记录会被清理
+    'max_versions': 20,              # 每条记录最多保留的历史版本数
+}
+TOMBSTONE_GRACE = 10 * 60  # 删除墓碑保留 10 分钟，让其他实例有时间同步
+OPEN_LATENCY_BUDGET_MS = 50  # 快速打开模式下从触发到首帧的目标耗时
+
+# 超过这个长度（字符数）的记录按块存储，打开时流式加载
+LARGE_CLIP_THRESHOLD = 256 * 1024
+CLIP_CHUNK_SIZE = 64 * 1024
+CLIP_PREVIEW_CHARS = 1000  # 大文本在 clips 表中只保存开头一段，用于列表显示
+CHUNK_IDX_STEP = 1024  # 分块序号之间留出空隙，局部保存时可以插入新分块
+LARGE_EDIT_THRESHOLD = 64 * 1024  # 超过这个长度的记录用分页的大文本窗口打开
+LARGE_CLIP_PAGE_CHARS = 16 * 1024  # 大文本窗口每页显示的字符数（超长单行文本排版很慢）
+# 常用度排序：每次使用的权重随时间指数衰减，半衰期 7 天。
+# rank = log(sum(exp(FRECENCY_DECAY * (t - FRECENCY_EPOCH))))，新的使用只需要一次 logaddexp，
+# 所有记录按同样的速度衰减，不需要定期重新计算。
+FRECENCY_EPOCH = 1704067200  # 2024-01-01，只用来让数值保持在较小的范围
+FRECENCY_DECAY = math.log(2) / (7 * 86400)
+VERSION_CHECKPOINT_INTERVAL = 16  # 历史版本每隔多少个保存一次完整内容，其余只保存差异
+
+# 外部推送（IPC、命令行）先进入有界队列，由后台线程分批写入数据库
+INGEST_QUEUE_MAX_ITEMS = 500
+INGEST_QUEUE_MAX_CHARS = 32 * 1024 * 1024
+INGEST_BATCH_ITEMS = 200  # 每批最多写入的记录数（一个事务）
+INGEST_BATCH_CHARS = 8 * 1024 * 1024
+INGEST_DRAIN_INTERVAL_MS = 30  # 推送后等待片刻再写入，让同一时间段的推送合并成一批
+
+# 转换在独立进程中执行，输入和输出都有长度上限
+TRANSFORM_MAX_INPUT_CHARS = 16 * 1024 * 1024
+TRANSFORM_MAX_OUTPUT_CHARS = 32 * 1024 * 1024
+TRANSFORM_WORKERS = 2  # 转换进程池的进程数，同时最多执行这么多个转换
+
+
+def changed_region(old, new):
+    """找出两段文本的差异区间，返回 (start, old_end, new_end)；文本相同时返回 None"""
+    if old == new:
+        return None
+    limit = min(len(old), len(new))
+    block = 4096
+    # 先按块比较公共前缀，再逐字符比较
+    start = 0
+    while start + block <= limit and old[start:start + block] == new[start:start + block]:
+        start += block
+    while start < limit and old[start] == new[start]:
+        start += 1
+    # 公共后缀不能与公共前缀重叠
+    limit -= start
+    end = 0
+    while end + block <= limit and old[len(old) - end - block:len(old) - end] == new[len(new) - end - block:len(new) - end]:
+        end += block
+    while end < limit and old[len(old) - end - 1] == new[len(new) - end - 1]:
+        end += 1
+    return start, len(old) - end, len(new) - end
+
+
+# 右键菜单中的转换操作：key -> (菜单名称, 函数)。函数在进程池中执行，必须定义在模块顶层；
+# 输入不合法时抛出 ValueError，消息会显示给用户。
+TRANSFORMS = {}
+
+
+def register_transform(key, label):
+    def decorator(func):
+        TRANSFORMS[key] = (label, func)
+        return func
+    return decorator
+
+
+@register_transform('pretty_json', "格式化 JSON")
+def transform_pretty_json(text):
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"不是有效的 JSON: {e}")
+    return json.dumps(data, ensure_ascii=False, indent=2)
+
+
+ANSI_ESCAPE_RE = re.compile(r'\x1b\[[0-?]*[ -/]*[@-~]|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)|\x1b[@-Z\\-_]')
+
+
+@register_transform('strip_ansi', "去除 ANSI 控制码")
+def transform_strip_ansi(text):
+    return ANSI_ESCAPE_RE.sub('', text)
+
+
+@register_transform('base64_decode', "Base64 解码")
+def transform_base64_decode(text):
+    data = ''.join(text.split())
+    data += '=' * (-len(data) % 4)
+    try:
+        if '-' in data or '_' in data:
+            raw = base64.urlsafe_b64decode(data)
+        else:
+            raw = base64.b64decode(data, validate=True)
+    except (ValueError, base64.binascii.Error):
+        raise ValueError("不是有效的 Base64 内容")
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        raise ValueError("解码结果不是 UTF-8 文本")
+
+
+@register_transform('base64_encode', "Base64 编码")
+def transform_base64_encode(text):
+    return base64.b64encode(text.encode('utf-8')).decode('ascii')
+
+
+# 全角标点和半角标点的对应关系（只转换标点，不转换字母和数字）
+FULLWIDTH_PUNCTUATION = {
+    '，': ',', '。': '.', '！': '!', '？': '?', '：': ':', '；': ';', '（': '(', '）': ')',
+    '【': '[', '】': ']', '《': '<', '》': '>', '、': ',', '“': '"', '”': '"', '‘': "'", '’': "'",
+    '～': '~', '　': ' ',
+}
+HALFWIDTH_PUNCTUATION = {
+    ',': '，', '.': '。', '!': '！', '?': '？', ':': '：', ';': '；', '(': '（', ')': '）',
+    '[': '【', ']': '】', '<': '《', '>': '》', '~': '～',
+}
+CJK_CHARS = r'\u3400-\u9fff\uf900-\ufaff\u3000-\u303f\uff00-\uffef'
+# 只转换紧挨着中文（中间可以有空格）的半角标点，网址、小数、英文句子中的标点保持不变
+_HALFWIDTH_CLASS = '[' + re.escape(''.join(HALFWIDTH_PUNCTUATION) + '"\'') + ']+'
+PUNCTUATION_NEAR_CJK_RE = re.compile(
+    rf'(?<=[{CJK_CHARS}]) *{_HALFWIDTH_CLASS}|{_HALFWIDTH_CLASS}(?= *[{CJK_CHARS}])')
+
+
+@register_transform('to_halfwidth', "标点转半角")
+def transform_to_halfwidth(text):
+    return text.translate(str.maketrans(FULLWIDTH_PUNCTUATION))
+
+
+@register_transform('to_fullwidth', "标点转全角")
+def transform_to_fullwidth(text):
+    table = str.maketrans(HALFWIDTH_PUNCTUATION)
+    # 引号按出现顺序交替使用左右引号（只计算被转换的引号）
+    quotes = {'"': ['“”', 0], "'": ['‘’', 0]}
+
+    def convert(match):
+        result = []
+        # 连续的句点是省略号，保持不变
+        for token in re.findall(r'\.{2,}|.', match.group(0)):
+            if token in quotes:
+                pair = quotes[token]
+                result.append(pair[0][pair[1] % 2])
+                pair[1] += 1
+            elif len(token) == 1:
+                result.append(token.translate(table))
+            else:
+                result.append(token)
+        return ''.join(result)
+
+    return PUNCTUATION_NEAR_CJK_RE.sub(convert, text)
+
+
+def run_transform(key, text):
+    """在进程池中执行转换，返回 (结果, 错误信息)"""
+    try:
+        result = TRANSFORMS[key][1](text)
+    except ValueError as e:
+        return None, str(e)
+    if len(result) > TRANSFORM_MAX_OUTPUT_CHARS:
+        return None, "转换结果过大"
+    return result, None
+
+
+# 记录类型，按筛选按钮的顺序排列；无法归类的记录为 text
+CLIP_KINDS = [
+    ('url', "链接"), ('json', "JSON"), ('code', "代码"), ('path', "路径"), ('email', "邮箱"),
+    ('number', "数字"), ('color', "颜色"), ('cjk', "中文"), ('text', "文本"),
+]
+CLASSIFY_SAMPLE_CHARS = 4096  # 分类只看开头一段，大文本不用整体读取
+
+COLOR_RE = re.compile(r'#(?:[0-9a-fA-F]{3,4}|[0-9a-fA-F]{6}|[0-9a-fA-F]{8})|'
+                      r'(?:rgb|rgba|hsl|hsla)\(\s*[\d.%]+\s*(?:,\s*[\d.%]+\s*){2,3}\)', re.IGNORECASE)
+NUMBER_RE = re.compile(r'[-+]?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?(?:[eE][-+]?\d+)?%?|0[xX][0-9a-fA-F]+')
+URL_RE = re.compile(r'(?:[a-zA-Z][a-zA-Z0-9+.-]*://|www\.)\S+')
+EMAIL_RE = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+PATH_RE = re.compile(r'(?:~|\.{1,2})?(?:/[^/\s][^/\n]*)+/?|[a-zA-Z]:\\[^\n]*|\\\\[^\s\\]+\\[^\n]*')
+CODE_RE = re.compile(r'^\s*(?:def |class |import |from \S+ import |function |const |let |var |return\b|#include|'
+                     r'public |private |fn |func |package |if \(|for \(|while \(|SELECT |INSERT |CREATE )|'
+                     r'[;{}]\s*$|=>|\)\s*\{', re.MULTILINE)
+CJK_RE = re.compile(f'[{CJK_CHARS}]')
+
+
+def classify_text(text, complete=True):
+    """判断内容类型；complete 为假时 text 只是开头的一段（大文本）"""
+    sample = text[:CLASSIFY_SAMPLE_CHARS].strip()
+    if not sample:
+        return 'text'
+    single_line = '\n' not in sample
+    if single_line and len(sample) < 64 and COLOR_RE.fullmatch(sample):
+        return 'color'
+    if single_line and len(sample) < 64 and NUMBER_RE.fullmatch(sample):
+        return 'number'
+    if single_line and URL_RE.fullmatch(sample):
+        return 'url'
+    if single_line and EMAIL_RE.fullmatch(sample):
+        return 'email'
+    if sample[0] in '{[':
+        if not complete or len(text) > CLASSIFY_SAMPLE_CHARS:
+            # 只看到开头，按结构特征判断
+            if re.match(r'[{\[]\s*(?:"|\{|\[|\]|\}|-?\d|true|false|null)', sample):
+                return 'json'
+        else:
+            try:
+                json.loads(sample)
+                return 'json'
+            except ValueError:
+                pass
+    if single_line and PATH_RE.fullmatch(sample):
+        return 'path'
+    lines = sample.splitlines()
+    if len(CODE_RE.findall(sample)) >= max(1, len(lines) // 4):
+        return 'code'
+    cjk = len(CJK_RE.findall(sample))
+    if cjk and cjk >= len(sample) * 0.2:
+        return 'cjk'
+    return 'text'
+
+
+class ChunkSearch:
+    """SQLite 聚合函数：在按顺序排列的分块中查找子串
+
+    保留上一块末尾的若干字符，跨越分块边界的匹配也能找到。
+    """
+    def __init__(self):
+        self.tail = ''
+        self.found = False
+
+    def step(self, data, query):
+        if self.found:
+            return
+        text = self.tail + data.lower()
+        if query in text:
+            self.found = True
+        # 分块可能比查询词还短，整块都要留下
+        self.tail = text[-(len(query) - 1):] if len(query) > 1 else ''
+
+    def finalize(self):
+        return int(self.found)
+
+
+def process_rss():
+    """当前进程的常驻内存（字节），无法获取时返回 None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # 取不到当前值时退而使用峰值（Linux 上单位是 KB，macOS 上是字节）
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def config_dir():
+    """配置目录，可以用环境变量 CLIPBOARD_MANAGER_DIR 指定其他位置"""
+    path = Path(os.environ.get('CLIPBOARD_MANAGER_DIR') or Path.home() / '.clipboard_manager')
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
 
 
 class CustomMenu(QMenu):
@@ -294,14 +590,271 @@ class CustomInputDialog(QDialog):
         self.result_text = self.text_edit.toPlainText()
         super().accept()
 
+class ClipStreamReader(QThread):
+    """在后台线程中按块读取记录内容，逐块发给界面"""
+    chunk_loaded = pyqtSignal(str)
+
+    def __init__(self, path, clip_id, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.clip_id = clip_id
+
+    def run(self):
+        store = ClipStore(self.path)
+        try:
+            for data in store.iter_chunks(self.clip_id):
+                if self.isInterruptionRequested():
+                    break
+                self.chunk_loaded.emit(data)
+        except sqlite3.Error as e:
+            logger.warning("读取大文本失败: %s", e)
+        finally:
+            store.close()
+
+class LargeClipDialog(QDialog):
+    """大文本查看/编辑窗口
+
+    打开时立即显示，内容在后台逐块读取，按页显示在只读的编辑框中，
+    避免一次性排版几 MB 的文本。加载完成后可以切换到编辑状态，
+    保存时只提交发生变化的区间。
+    """
+    def __init__(self, parent, store_path, clip_id):
+        super().__init__(parent)
+        self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.Dialog)
+        self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
+        self.chunks = []
+        self.loaded_length = 0
+        self.original = None
+        self.loaded = False
+        self.editing = False
+        self.page = 0
+        self.shown_page = None
+        self.page_edits = {}  # 页码 -> 修改后的内容
+        self.setup_ui()
+        
+        self.reader = ClipStreamReader(store_path, clip_id, self)
+        self.reader.chunk_loaded.connect(self.append_chunk)
+        self.reader.finished.connect(self.on_loaded)
+        self.reader.start()
+        
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        
+        # 主容器
+        container = QWidget(self)
+        container.setStyleSheet("""
+            QWidget {
+                background: qlineargradient(
+                    x1: 0, y1: 0,
+                    x2: 0, y2: 1,
+                    stop: 0 #f5f7fa,
+                    stop: 1 #e4e7eb
+                );
+                border-radius: 15px;
+            }
+        """)
+        container_layout = QVBoxLayout(container)
+        container_layout.setContentsMargins(20, 20, 20, 20)
+        container_layout.setSpacing(15)
+        
+        # 标题（显示加载进度）
+        self.title = QLabel("大文本 - 加载中...")
+        self.title.setStyleSheet("""
+            QLabel {
+                color: #1e293b;
+                font-size: 15px;
+                font-weight: bold;
+                background: transparent;
+            }
+        """)
+        container_layout.addWidget(self.title)
+        
+        # 只读文本框，每次只放一页内容
+        self.text_edit = QPlainTextEdit()
+        self.text_edit.setReadOnly(True)
+        self.text_edit.setMinimumSize(480, 320)
+        self.text_edit.setStyleSheet("""
+            QPlainTextEdit {
+                padding: 10px;
+                background: white;
+                border: 1px solid #d1d5db;
+                border-radius: 10px;
+                font-size: 13px;
+                color: #334155;
+                selection-background-color: #93c5fd;
+            }
+            QPlainTextEdit:focus {
+                border: 1px solid #60a5fa;
+                background: #f8fafc;
+            }
+        """)
+        container_layout.addWidget(self.text_edit)
+        
+        # 按钮容器
+        button_container = QWidget()
+        button_container.setStyleSheet("background: transparent;")
+        button_layout = QHBoxLayout(button_container)
+        button_layout.setContentsMargins(0, 0, 0, 0)
+        
+        self.prev_button = QPushButton("上一页")
+        self.next_button = QPushButton("下一页")
+        self.page_label = QLabel("1/1")
+        self.page_label.setStyleSheet("QLabel { color: #2c3e50; background: transparent; padding: 0 6px; }")
+        self.edit_button = QPushButton("编辑")
+        self.ok_button = QPushButton("保存")
+        cancel_button = QPushButton("关闭")
+        
+        for button in [self.prev_button, self.next_button, self.edit_button, self.ok_button, cancel_button]:
+            button.setFixedSize(80, 32)
+            button.setStyleSheet("""
+                QPushButton {
+                    background: qlineargradient(
+                        x1: 0, y1: 0,
+                        x2: 0, y2: 1,
+                        stop: 0 #60a5fa,
+                        stop: 1 #3b82f6
+                    );
+                    color: white;
+                    border: none;
+                    border-radius: 16px;
+                    font-size: 13px;
+                }
+                QPushButton:hover {
+                    background: qlineargradient(
+                        x1: 0, y1: 0,
+                        x2: 0, y2: 1,
+                        stop: 0 #3b82f6,
+                        stop: 1 #2563eb
+                    );
+                }
+                QPushButton:disabled {
+                    background: #cbd5e1;
+                }
+            """)
+        
+        # 加载完成之前不能编辑和保存
+        self.edit_button.setEnabled(False)
+        self.ok_button.setEnabled(False)
+        self.prev_button.clicked.connect(lambda: self.show_page(self.page - 1))
+        self.next_button.clicked.connect(lambda: self.show_page(self.page + 1))
+        self.edit_button.clicked.connect(self.start_editing)
+        self.ok_button.clicked.connect(self.accept)
+        cancel_button.clicked.connect(self.reject)
+        
+        button_layout.addWidget(self.prev_button)
+        button_layout.addWidget(self.page_label)
+        button_layout.addWidget(self.next_button)
+        button_layout.addStretch()
+        button_layout.addWidget(self.edit_button)
+        button_layout.addWidget(self.ok_button)
+        button_layout.addWidget(cancel_button)
+        
+        container_layout.addWidget(button_container)
+        layout.addWidget(container)
+        self.update_page_controls()
+        
+    def page_count(self):
+        return max(1, (self.loaded_length - 1) // LARGE_CLIP_PAGE_CHARS + 1)
+        
+    def loaded_text(self):
+        if self.original is not None:
+            return self.original
+        if len(self.chunks) > 1:
+            self.chunks = [''.join(self.chunks)]
+        return self.chunks[0] if self.chunks else ''
+        
+    def append_chunk(self, data):
+        self.chunks.append(data)
+        self.loaded_length += len(data)
+        self.title.setText(f"大文本 - 已加载 {self.loaded_length // 1024} K 字符...")
+        # 第一页的内容到齐后立即显示
+        if self.shown_page is None and (self.loaded_length >= LARGE_CLIP_PAGE_CHARS):
+            self.show_page(0)
+        self.update_page_controls()
+        
+    def on_loaded(self):
+        self.loaded = True
+        self.original = ''.join(self.chunks)
+        self.chunks = []
+        self.title.setText(f"大文本 - 共 {len(self.original) // 1024} K 字符")
+        if self.shown_page is None:
+            self.show_page(0)
+        self.edit_button.setEnabled(True)
+        self.update_page_controls()
+        
+    def page_text(self, page):
+        if page in self.page_edits:
+            return self.page_edits[page]
+        start = page * LARGE_CLIP_PAGE_CHARS
+        return self.loaded_text()[start:start + LARGE_CLIP_PAGE_CHARS]
+        
+    def show_page(self, page):
+        if not 0 <= page < self.page_count():
+            return
+        self.save_page_edit()
+        self.page = page
+        self.shown_page = page
+        self.text_edit.setPlainText(self.page_text(page))
+        self.update_page_controls()
+        
+    def save_page_edit(self):
+        if self.editing and self.shown_page is not None and self.text_edit.document().isModified():
+            self.page_edits[self.shown_page] = self.text_edit.toPlainText()
+            
+    def update_page_controls(self):
+        self.page_label.setText(f"{self.page + 1}/{self.page_count()}")
+        self.prev_button.setEnabled(self.page > 0)
+        # 下一页的内容已经完整加载后才能翻页
+        next_end = (self.page + 2) * LARGE_CLIP_PAGE_CHARS
+        self.next_button.setEnabled(self.page + 1 < self.page_count() and
+                                    (self.loaded or self.loaded_length >= next_end))
+        
+    def start_editing(self):
+        self.editing = True
+        self.text_edit.document().setModified(False)
+        self.text_edit.setReadOnly(False)
+        self.text_edit.setFocus()
+        self.edit_button.setEnabled(False)
+        self.ok_button.setEnabled(True)
+        
+    def get_changes(self):
+        """返回 (start, old_end, replacement, new_text)，没有修改时返回 None"""
+        if not self.loaded:
+            return None
+        self.save_page_edit()
+        if not self.page_edits:
+            return None
+        new_text = ''.join(self.page_text(page) for page in range(self.page_count()))
+        region = changed_region(self.original, new_text)
+        if region is None or not new_text:
+            return None
+        start, old_end, new_end = region
+        return start, old_end, new_text[start:new_end], new_text
+        
+    def done(self, result):
+        # 关闭窗口时停止后台加载
+        self.reader.requestInterruption()
+        self.reader.wait()
+        super().done(result)
+
 class ClipItem(QFrame):
-    def __init__(self, text, parent=None, manager=None):
+    def __init__(self, clip_id, text, parent=None, manager=None, pinned=False, chunked=False, selected=False):
         super().__init__(parent)
-        self.text = text
+        self.clip_id = clip_id
+        self.text = text  # 大文本（chunked）这里只有开头的预览
+        self.pinned = pinned
+        self.chunked = chunked
+        self.selected = selected
         self.manager = manager
         # 获取基础单位
         self.base_unit = manager.base_unit if manager else 10
         self.init_ui()
+        # 复制后的高亮由子定时器恢复，条目被删除时定时器随之销毁
+        self.feedback_timer = QTimer(self)
+        self.feedback_timer.setSingleShot(True)
+        self.feedback_timer.setInterval(200)
+        self.feedback_timer.timeout.connect(lambda: self.set_selected(self.selected))
         
     def init_ui(self):
         # 使用百分比设置边距和间距
@@ -313,6 +866,8 @@ class ClipItem(QFrame):
         # 文本标签 - 只显示第一行，限制40个字符
         first_line = self.text.split('\n')[0]
         display_text = first_line[:40] + "..." if len(first_line) > 40 else first_line
+        if self.pinned:
+            display_text = "📌 " + display_text
         self.label = QLabel(display_text)
         self.label.setFixedHeight(int(self.base_unit * 2))
         self.label.setStyleSheet("""
@@ -342,43 +897,97 @@ class ClipItem(QFrame):
         self.layout.addWidget(self.label, stretch=1)
         self.layout.addWidget(delete_button)
         
-        self.setStyleSheet("""
-            ClipItem {
-                background: white;
-                border-radius: 10px;
-                border: 1px solid #e2e8f0;
-            }
-            ClipItem:hover {
-                background: #f8fafc;
-                border: 1px solid #60a5fa;
-            }
-        """)
+        self.set_selected(self.selected)
+        
+    def set_selected(self, selected):
+        self.selected = selected
+        if selected:
+            self.setStyleSheet("""
+                ClipItem {
+                    background: #eff6ff;
+                    border-radius: 10px;
+                    border: 2px solid #3b82f6;
+                }
+            """)
+        else:
+            self.setStyleSheet("""
+                ClipItem {
+                    background: white;
+                    border-radius: 10px;
+                    border: 1px solid #e2e8f0;
+                }
+                ClipItem:hover {
+                    background: #f8fafc;
+                    border: 1px solid #60a5fa;
+                }
+            """)
         
     def mousePressEvent(self, event):
-        if event.button() == Qt.MouseButton.LeftButton:
+        if (event.button() == Qt.MouseButton.LeftButton and self.manager and
+                (event.modifiers() & Qt.KeyboardModifier.ControlModifier or self.manager.selected_ids)):
+            # 按住 Ctrl 单击（或已经有选中的记录时单击）切换选中状态
+            self.manager.toggle_selection(self.clip_id)
+        elif event.button() == Qt.MouseButton.LeftButton:
+            text = self.manager.clip_text(self.clip_id) if self.chunked and self.manager else self.text
             # 去除前后的空格和换行
-            cleaned_text = self.text.strip()
+            cleaned_text = text.strip()
             pyperclip.copy(cleaned_text)
+            if self.manager:
+                # 只记录使用次数，不重新排序当前页，下次刷新时生效
+                self.manager.store.record_use(self.clip_id)
             self.flash_feedback()
         elif event.button() == Qt.MouseButton.RightButton and self.manager:
             self.show_context_menu(event.pos())
             
     def show_context_menu(self, pos):
-        menu = CustomMenu(self)
+        # 菜单和对话框挂在主窗口上：打开期间列表可能因同步而刷新，条目随时会被销毁
+        menu = CustomMenu(self.window())
         edit_action = menu.addAction("编辑")
         edit_action.triggered.connect(self.edit_content)
+        pin_action = menu.addAction("取消固定" if self.pinned else "固定")
+        pin_action.triggered.connect(lambda: self.manager.pin_clip(self.clip_id, not self.pinned))
+        select_action = menu.addAction("取消选择" if self.selected else "选择")
+        select_action.triggered.connect(lambda: self.manager.toggle_selection(self.clip_id))
+        versions = self.manager.store.versions(self.clip_id)
+        if versions:
+            # 历史版本：恢复后当前内容也会成为一个历史版本，可以再恢复回来
+            history_menu = CustomMenu("历史版本", menu)
+            for version, created in versions[:10]:
+                label = f"版本 {version + 1}  {time.strftime('%m-%d %H:%M', time.localtime(created))}"
+                action = history_menu.addAction(label)
+                action.triggered.connect(lambda checked=False, v=version: self.manager.restore_version(self.clip_id, v))
+            menu.addMenu(history_menu)
+        # 转换在后台进程中执行，结果作为新记录加入历史
+        transform_menu = CustomMenu("转换", menu)
+        for key, (label, _) in TRANSFORMS.items():
+            action = transform_menu.addAction(label)
+            action.triggered.connect(lambda checked=False, k=key: self.manager.transform_clip(self.clip_id, k))
+        menu.addMenu(transform_menu)
+        if self.manager.transform_runner.pending_for(self.clip_id):
+            cancel_action = menu.addAction("取消转换")
+            cancel_action.triggered.connect(lambda: self.manager.cancel_transforms(self.clip_id))
         menu.exec(self.mapToGlobal(pos))
+        # 不释放的话每次右键都会多一个菜单对象
+        menu.deleteLater()
         
     def edit_content(self):
-        if self.manager:
-            dialog = CustomInputDialog(self, self.text)
+        if self.manager and (self.chunked or len(self.text) > LARGE_EDIT_THRESHOLD):
+            # 大文本先以只读方式打开，后台逐块加载
+            dialog = LargeClipDialog(self.window(), self.manager.store.path, self.clip_id)
+            if dialog.exec() == QDialog.DialogCode.Accepted:
+                changes = dialog.get_changes()
+                if changes:
+                    self.manager.edit_clip_region(self.clip_id, *changes)
+            dialog.deleteLater()
+        elif self.manager:
+            dialog = CustomInputDialog(self.window(), self.text)
             if dialog.exec() == QDialog.DialogCode.Accepted:
                 new_text = dialog.get_text()
                 if new_text:
-                    self.manager.edit_clip(self.text, new_text)
+                    self.manager.edit_clip(self.clip_id, new_text)
+            dialog.deleteLater()
         
     def flash_feedback(self):
-        original_style = self.styleSheet()
         self.setStyleSheet("""
             ClipItem {
                 background: #dbeafe;
@@ -386,7 +995,7 @@ class ClipItem(QFrame):
                 border: 1px solid #60a5fa;
             }
         """)
-        QTimer.singleShot(200, lambda: self.setStyleSheet(original_style))
+        self.feedback_timer.start()
         
     def confirm_delete(self):
         if self.manager:
@@ -400,8 +1009,10 @@ class ClipItem(QFrame):
             dialog.move(center.x() - dialog.width() // 2,
                        center.y() - dialog.height() // 2)
             
-            if dialog.exec() == QDialog.DialogCode.Accepted:
-                self.manager.delete_clip(self.text)
+            accepted = dialog.exec() == QDialog.DialogCode.Accepted
+            dialog.deleteLater()
+            if accepted:
+                self.manager.delete_clip(self.clip_id)
 
 class EmptyClipItem(QFrame):
     def __init__(self, parent=None):
@@ -415,6 +1026,1095 @@ class EmptyClipItem(QFrame):
             }
         """)
 
+class FrameTimer:
+    """记录动画每一帧的时间点，统计帧间隔，用来确认帧节奏是否平稳"""
+    def __init__(self):
+        self.timestamps = []
+
+    def start(self):
+        self.timestamps = [time.perf_counter()]
+
+    def tick(self):
+        self.timestamps.append(time.perf_counter())
+
+    def stats(self):
+        intervals = [(b - a) * 1000 for a, b in zip(self.timestamps, self.timestamps[1:])]
+        if not intervals:
+            return {'frames': 0, 'duration_ms': 0.0, 'mean_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+        ordered = sorted(intervals)
+        return {
+            'frames': len(intervals),
+            'duration_ms': round(sum(intervals), 2),
+            'mean_ms': round(sum(intervals) / len(intervals), 2),
+            'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+            'max_ms': round(ordered[-1], 2),
+        }
+
+class IngestQueue:
+    """有界的写入队列
+
+    队列中已有相同内容时合并（coalesced）；超过条数或字符数上限时，
+    drop_oldest 策略丢弃最早的待写入内容，drop_newest 策略拒绝新内容（dropped）。
+    """
+    def __init__(self, max_items=INGEST_QUEUE_MAX_ITEMS, max_chars=INGEST_QUEUE_MAX_CHARS, policy='drop_oldest'):
+        self.max_items = max_items
+        self.max_chars = max_chars
+        self.policy = policy
+        self.items = deque()
+        self.pending = set()
+        self.chars = 0
+        self.counters = {'accepted': 0, 'coalesced': 0, 'dropped': 0, 'written': 0, 'peak_depth': 0}
+
+    def __len__(self):
+        return len(self.items)
+
+    def put(self, text):
+        """放入一条内容，返回 'queued'、'coalesced' 或 'dropped'"""
+        if text in self.pending:
+            self.counters['coalesced'] += 1
+            return 'coalesced'
+        if len(text) > self.max_chars:
+            self.counters['dropped'] += 1
+            return 'dropped'
+        while self.items and (len(self.items) >= self.max_items or self.chars + len(text) > self.max_chars):
+            if self.policy == 'drop_newest':
+                self.counters['dropped'] += 1
+                return 'dropped'
+            self.discard(self.items.popleft())
+            self.counters['dropped'] += 1
+        self.items.append(text)
+        self.pending.add(text)
+        self.chars += len(text)
+        self.counters['accepted'] += 1
+        self.counters['peak_depth'] = max(self.counters['peak_depth'], len(self.items))
+        return 'queued'
+
+    def discard(self, text):
+        self.pending.discard(text)
+        self.chars -= len(text)
+
+    def take(self, max_items=INGEST_BATCH_ITEMS, max_chars=INGEST_BATCH_CHARS):
+        """取出一批内容（至少一条）"""
+        batch = []
+        chars = 0
+        while self.items and len(batch) < max_items and (not batch or chars + len(self.items[0]) <= max_chars):
+            text = self.items.popleft()
+            self.discard(text)
+            batch.append(text)
+            chars += len(text)
+        return batch
+
+    def stats(self):
+        return dict(self.counters, depth=len(self.items), pending_chars=self.chars, policy=self.policy)
+
+class StallWatchdog:
+    """主线程卡顿监视器（默认关闭）
+
+    主线程中的定时器定期更新心跳时间；后台线程发现心跳超过阈值没有更新时，
+    用 sys._current_frames 抓取主线程当前的 Python 调用栈，立即写入配置目录下的
+    stalls.log（按大小轮转），主线程一直卡死时日志里也有调用栈。卡顿结束后
+    再记录持续时间并计入直方图。
+    """
+    BUCKETS_MS = [100, 250, 500, 1000, 2000, 5000]
+
+    def __init__(self, threshold_ms=250, interval_ms=50, log_path=None):
+        self.threshold = threshold_ms / 1000
+        self.interval_ms = interval_ms
+        self.main_thread_id = threading.main_thread().ident
+        self.last_beat = time.monotonic()
+        self.histogram = [0] * (len(self.BUCKETS_MS) + 1)  # 最后一格是超过最大档位的卡顿
+        self.stall_count = 0
+        self.samples = 0  # 当前卡顿中抓取的调用栈数量
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        self.log = logging.getLogger('clipboard_manager.stalls')
+        self.log.propagate = False
+        self.log.setLevel(logging.INFO)
+        if not self.log.handlers:
+            handler = logging.handlers.RotatingFileHandler(
+                str(log_path or config_dir() / 'stalls.log'), maxBytes=1024 * 1024, backupCount=3,
+                encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            self.log.addHandler(handler)
+
+        # 心跳定时器必须在主线程中创建
+        self.timer = QTimer()
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.beat)
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.last_beat = time.monotonic()
+        self.stop_event.clear()
+        self.timer.start()
+        # 普通的守护线程：主线程卡住时它仍然要能运行，不能依赖 Qt 事件循环
+        self.thread = threading.Thread(target=self.run, name='stall-watchdog', daemon=True)
+        self.thread.start()
+        self.log.info("watchdog started (threshold %d ms)", self.threshold * 1000)
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.timer.stop()
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+        self.log.info("watchdog stopped, histogram: %s", self.format_histogram())
+
+    def beat(self):
+        now = time.monotonic()
+        with self.lock:
+            stalled = now - self.last_beat - self.interval_ms / 1000
+            samples, self.samples = self.samples, 0
+            self.last_beat = now
+        if stalled >= self.threshold:
+            self.record_stall(stalled * 1000, samples)
+
+    def run(self):
+        next_sample = None
+        while not self.stop_event.wait(self.interval_ms / 2000):
+            with self.lock:
+                blocked = time.monotonic() - self.last_beat - self.interval_ms / 1000
+                if blocked < self.threshold:
+                    next_sample = None
+                    continue
+                # 卡顿期间每秒再抓一次，长时间卡顿时能看到调用栈的变化（最多 5 次）
+                if next_sample is not None and (blocked < next_sample or self.samples >= 5):
+                    continue
+                next_sample = blocked + 1.0
+                frame = sys._current_frames().get(self.main_thread_id)
+                if frame is None:
+                    continue
+                stack = ''.join(traceback.format_stack(frame))
+                del frame
+                self.samples += 1
+            # 在后台线程中直接写日志：主线程可能再也不会恢复
+            self.log.warning("main thread blocked for %.0f ms, stack:\n%s", blocked * 1000, stack.rstrip())
+
+    def record_stall(self, duration_ms, samples):
+        bucket = 0
+        while bucket < len(self.BUCKETS_MS) and duration_ms > self.BUCKETS_MS[bucket]:
+            bucket += 1
+        self.histogram[bucket] += 1
+        self.stall_count += 1
+        self.log.warning("main thread stalled for %.0f ms (%d stacks logged)", duration_ms, samples)
+        # 每 20 次卡顿记录一次直方图
+        if self.stall_count % 20 == 0:
+            self.log.info("histogram: %s", self.format_histogram())
+
+    def stats(self):
+        labels = [f"<={ms}ms" for ms in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}ms"]
+        return {'stalls': self.stall_count, 'threshold_ms': round(self.threshold * 1000),
+                'histogram': dict(zip(labels, self.histogram))}
+
+    def format_histogram(self):
+        return ' '.join(f"{label}:{count}" for label, count in self.stats()['histogram'].items())
+
+class SnapshotAnimator(QWidget):
+    """用截图完成收缩/展开动画
+
+    动画期间真实窗口保持隐藏，这里只在一个覆盖起止区域的透明窗口上
+    绘制缩放后的截图，每一帧既不改变窗口大小，也不触发控件布局。
+    """
+    finished = pyqtSignal(dict)
+
+    def __init__(self):
+        super().__init__(None, Qt.WindowType.FramelessWindowHint | Qt.WindowType.WindowStaysOnTopHint |
+                         Qt.WindowType.Tool)
+        self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.setAttribute(Qt.WidgetAttribute.WA_ShowWithoutActivating)
+        self.start_pixmap = None
+        self.end_pixmap = None
+        self.start_rect = QRectF()
+        self.end_rect = QRectF()
+        self.progress = 0.0
+        self.frame_timer = FrameTimer()
+
+        self.anim = QVariantAnimation(self)
+        self.anim.setStartValue(0.0)
+        self.anim.setEndValue(1.0)
+        self.anim.setEasingCurve(QEasingCurve.Type.OutQuad)
+        self.anim.valueChanged.connect(self.on_value_changed)
+        self.anim.finished.connect(self.on_finished)
+
+    def start(self, start_pixmap, end_pixmap, start_geometry, end_geometry, duration=300):
+        self.anim.stop()
+        self.start_pixmap = start_pixmap
+        self.end_pixmap = end_pixmap
+        # 覆盖窗口只在动画开始时定位一次
+        area = start_geometry.united(end_geometry)
+        offset = QPointF(area.topLeft())
+        self.start_rect = QRectF(start_geometry).translated(-offset)
+        self.end_rect = QRectF(end_geometry).translated(-offset)
+        self.progress = 0.0
+        self.setGeometry(area)
+        self.frame_timer.start()
+        self.show()
+        self.anim.setDuration(duration)
+        self.anim.start()
+
+    def cancel(self):
+        """中途停止动画，不发出 finished"""
+        self.anim.stop()
+        self.hide()
+        self.start_pixmap = None
+        self.end_pixmap = None
+
+    def on_value_changed(self, value):
+        self.progress = value
+        self.update()
+
+    def on_finished(self):
+        self.hide()
+        # 释放截图，避免长期占用内存
+        self.start_pixmap = None
+        self.end_pixmap = None
+        self.finished.emit(self.frame_timer.stats())
+
+    def current_rect(self):
+        p = self.progress
+        s, e = self.start_rect, self.end_rect
+        return QRectF(s.x() + (e.x() - s.x()) * p,
+                      s.y() + (e.y() - s.y()) * p,
+                      s.width() + (e.width() - s.width()) * p,
+                      s.height() + (e.height() - s.height()) * p)
+
+    def paintEvent(self, event):
+        self.frame_timer.tick()
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        rect = self.current_rect()
+        # 起止截图交叉淡入淡出
+        if self.start_pixmap is not None:
+            painter.setOpacity(1.0 - self.progress)
+            painter.drawPixmap(rect, self.start_pixmap, QRectF(self.start_pixmap.rect()))
+        if self.end_pixmap is not None:
+            painter.setOpacity(self.progress)
+            painter.drawPixmap(rect, self.end_pixmap, QRectF(self.end_pixmap.rect()))
+
+class ClipStore:
+    """基于 SQLite 的剪贴板历史存储
+
+    多个实例可以同时打开同一个数据库：所有写入都在事务中完成（WAL 模式），
+    每次修改都会给记录分配一个递增的序号 seq，其他实例只需读取 seq 大于
+    上次同步位置的记录即可增量更新。删除的记录保留为墓碑，以便同步删除操作。
+    """
+    MIGRATIONS = [
+        """
+        CREATE TABLE IF NOT EXISTS clips (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            text TEXT NOT NULL,
+            digest TEXT NOT NULL,
+            created REAL NOT NULL,
+            seq INTEGER NOT NULL,
+            deleted INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_clips_seq ON clips(seq);
+        CREATE INDEX IF NOT EXISTS idx_clips_digest ON clips(digest);
+        """,
+        """
+        ALTER TABLE clips ADD COLUMN pinned INTEGER NOT NULL DEFAULT 0;
+        ALTER TABLE clips ADD COLUMN size INTEGER NOT NULL DEFAULT 0;
+        ALTER TABLE clips ADD COLUMN updated REAL NOT NULL DEFAULT 0;
+        UPDATE clips SET size = length(CAST(text AS BLOB)), updated = created;
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+        """,
+        """
+        ALTER TABLE clips ADD COLUMN chunked INTEGER NOT NULL DEFAULT 0;
+        CREATE TABLE IF NOT EXISTS clip_chunks (
+            clip_id INTEGER NOT NULL,
+            idx INTEGER NOT NULL,
+            length INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (clip_id, idx)
+        );
+        """,
+        """
+        ALTER TABLE clips ADD COLUMN version INTEGER NOT NULL DEFAULT 0;
+        CREATE TABLE IF NOT EXISTS clip_versions (
+            clip_id INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            created REAL NOT NULL,
+            full INTEGER NOT NULL DEFAULT 0,
+            start INTEGER,
+            end INTEGER,
+            data TEXT NOT NULL,
+            PRIMARY KEY (clip_id, version)
+        );
+        """,
+        # 添加记录算作一次使用，从未复制过的记录按添加时间排序
+        f"""
+        ALTER TABLE clips ADD COLUMN uses INTEGER NOT NULL DEFAULT 0;
+        ALTER TABLE clips ADD COLUMN rank REAL NOT NULL DEFAULT 0;
+        UPDATE clips SET rank = (created - {FRECENCY_EPOCH}) * {FRECENCY_DECAY!r};
+        CREATE INDEX IF NOT EXISTS idx_clips_rank ON clips(rank, id);
+        """,
+        # kind 为 NULL 表示还没有分类，由后台线程补上
+        """
+        ALTER TABLE clips ADD COLUMN kind TEXT;
+        CREATE INDEX IF NOT EXISTS idx_clips_kind ON clips(kind, id);
+        CREATE INDEX IF NOT EXISTS idx_clips_kind_rank ON clips(kind, rank, id);
+        """,
+    ]
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(str(self.path), timeout=10.0, isolation_level=None)
+        # 新建数据库时开启增量回收，压缩时不必整库 VACUUM
+        self.conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        # 搜索时按 Python 的 lower() 做不区分大小写的匹配（SQLite 的 LIKE 只处理 ASCII）
+        self.conn.create_function('contains_text', 2, lambda text, query: query in text.lower(),
+                                  deterministic=True)
+        self.conn.create_aggregate('chunks_contain', 2, ChunkSearch)
+        self.transaction_depth = 0
+        self.migrate()
+
+    def migrate(self):
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] >= len(self.MIGRATIONS):
+            return
+        with self.transaction():
+            version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+            for script in self.MIGRATIONS[version:]:
+                for statement in script.split(';'):
+                    if statement.strip():
+                        self.conn.execute(statement)
+            self.conn.execute(f'PRAGMA user_version = {len(self.MIGRATIONS)}')
+
+    def close(self):
+        self.conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """写事务，支持嵌套（只有最外层真正提交）"""
+        if self.transaction_depth == 0:
+            self.conn.execute('BEGIN IMMEDIATE')
+        self.transaction_depth += 1
+        try:
+            yield self.conn
+        except BaseException:
+            self.transaction_depth -= 1
+            if self.transaction_depth == 0:
+                self.conn.execute('ROLLBACK')
+            raise
+        else:
+            self.transaction_depth -= 1
+            if self.transaction_depth == 0:
+                self.conn.execute('COMMIT')
+
+    @staticmethod
+    def digest(text):
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def next_seq(self):
+        # 清除墓碑会删掉最大的 seq，新序号不能小于已清除的序号，否则其他实例会跳过这些修改
+        return self.max_seq() + 1
+
+    def data_version(self):
+        """其他连接提交修改后这个值会变化，用来廉价地判断是否需要同步"""
+        return self.conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def max_seq(self):
+        return self.conn.execute(
+            "SELECT MAX(IFNULL((SELECT MAX(seq) FROM clips), 0), "
+            "IFNULL((SELECT value FROM meta WHERE key = 'purged_seq'), 0))").fetchone()[0]
+
+    def find_id(self, text):
+        row = self.conn.execute(
+            'SELECT id FROM clips WHERE digest = ? AND deleted = 0', (self.digest(text),)).fetchone()
+        return row[0] if row else None
+
+    def record(self, clip_id):
+        """返回 (id, text, pinned, chunked)，大文本的 text 只是开头的预览；记录不存在时返回 None"""
+        return self.conn.execute('SELECT id, text, pinned, chunked FROM clips WHERE id = ? AND deleted = 0',
+                                 (clip_id,)).fetchone()
+
+    def full_text(self, clip_id):
+        """返回记录的完整内容，记录不存在时返回 None"""
+        record = self.record(clip_id)
+        if record is None:
+            return None
+        if not record[3]:
+            return record[1]
+        return ''.join(self.iter_chunks(clip_id))
+
+    def iter_chunks(self, clip_id):
+        """按顺序逐块读取记录内容"""
+        record = self.record(clip_id)
+        if record is None:
+            return
+        if not record[3]:
+            text = record[1]
+            for start in range(0, len(text), CLIP_CHUNK_SIZE):
+                yield text[start:start + CLIP_CHUNK_SIZE]
+            return
+        for (data,) in self.conn.execute(
+                'SELECT data FROM clip_chunks WHERE clip_id = ? ORDER BY idx', (clip_id,)):
+            yield data
+
+    def write_chunks(self, clip_id, text):
+        """把完整内容重新切块写入"""
+        self.conn.execute('DELETE FROM clip_chunks WHERE clip_id = ?', (clip_id,))
+        self.conn.executemany(
+            'INSERT INTO clip_chunks (clip_id, idx, length, data) VALUES (?, ?, ?, ?)',
+            ((clip_id, i * CHUNK_IDX_STEP, len(text[start:start + CLIP_CHUNK_SIZE]),
+              text[start:start + CLIP_CHUNK_SIZE])
+             for i, start in enumerate(range(0, len(text), CLIP_CHUNK_SIZE))))
+
+    def add(self, text):
+        """新增记录，内容已存在时返回 None"""
+        with self.transaction():
+            if self.find_id(text) is not None:
+                return None
+            now = time.time()
+            chunked = len(text) > LARGE_CLIP_THRESHOLD
+            cursor = self.conn.execute(
+                'INSERT INTO clips (text, digest, size, chunked, created, updated, seq, rank) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (text[:CLIP_PREVIEW_CHARS] if chunked else text, self.digest(text),
+                 len(text.encode('utf-8')), int(chunked), now, now, self.next_seq(),
+                 (now - FRECENCY_EPOCH) * FRECENCY_DECAY))
+            if chunked:
+                self.write_chunks(cursor.lastrowid, text)
+            return cursor.lastrowid
+
+    def save_version(self, clip_id, start, new_end, old_slice, old_text=None):
+        """把修改前的内容保存为历史版本
+
+        历史版本按反向差异保存：版本 v 的内容等于版本 v+1 的内容把 [start, end)
+        替换为 data。每隔 VERSION_CHECKPOINT_INTERVAL 个版本保存一次完整内容，
+        恢复任意版本最多只需要应用这么多个差异。old_text 只在需要保存完整内容时读取，
+        可以传入函数。
+        """
+        version, updated = self.conn.execute(
+            'SELECT version, updated FROM clips WHERE id = ?', (clip_id,)).fetchone()
+        if version % VERSION_CHECKPOINT_INTERVAL == VERSION_CHECKPOINT_INTERVAL - 1:
+            data = old_text() if callable(old_text) else old_text
+            row = (clip_id, version, updated, 1, None, None, data)
+        else:
+            row = (clip_id, version, updated, 0, start, new_end, old_slice)
+        self.conn.execute(
+            'INSERT OR REPLACE INTO clip_versions (clip_id, version, created, full, start, end, data) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)', row)
+        self.conn.execute('UPDATE clips SET version = version + 1 WHERE id = ?', (clip_id,))
+
+    def versions(self, clip_id):
+        """返回记录的历史版本 [(version, created)]，从新到旧，不包括当前版本"""
+        return self.conn.execute(
+            'SELECT version, created FROM clip_versions WHERE clip_id = ? ORDER BY version DESC',
+            (clip_id,)).fetchall()
+
+    def version_text(self, clip_id, version):
+        """还原指定版本的内容：从它之后最近的完整版本（或当前内容）开始反向应用差异"""
+        record = self.conn.execute(
+            'SELECT version FROM clips WHERE id = ? AND deleted = 0', (clip_id,)).fetchone()
+        if record is None:
+            return None
+        if version == record[0]:
+            return self.full_text(clip_id)
+        if self.conn.execute('SELECT 1 FROM clip_versions WHERE clip_id = ? AND version = ?',
+                             (clip_id, version)).fetchone() is None:
+            return None
+        checkpoint = self.conn.execute(
+            'SELECT version, data FROM clip_versions WHERE clip_id = ? AND version >= ? AND full = 1 '
+            'ORDER BY version LIMIT 1', (clip_id, version)).fetchone()
+        if checkpoint is not None:
+            newest, text = checkpoint
+        else:
+            newest, text = record[0], self.full_text(clip_id)
+        for start, end, data in self.conn.execute(
+                'SELECT start, end, data FROM clip_versions WHERE clip_id = ? AND version >= ? AND version < ? '
+                'ORDER BY version DESC', (clip_id, version, newest)):
+            text = text[:start] + data + text[end:]
+        return text
+
+    def restore_version(self, clip_id, version):
+        """把记录恢复到指定的历史版本，只改写有差异的区间；当前内容会成为新的历史版本"""
+        with self.transaction():
+            old_text = self.full_text(clip_id)
+            new_text = self.version_text(clip_id, version)
+            if old_text is None or new_text is None:
+                return False
+            region = changed_region(old_text, new_text)
+            if region is None:
+                return False
+            start, old_end, new_end = region
+            return (self.update_region(clip_id, start, old_end, new_text[start:new_end], self.digest(new_text))
+                    or self.update(clip_id, new_text))
+
+    def prune_versions(self, policy):
+        """按保留策略删除旧的历史版本；旧版本只被更旧的版本依赖，可以直接删除"""
+        pruned = 0
+        max_versions = policy.get('max_versions') or 0
+        if max_versions > 0:
+            pruned += self.conn.execute(
+                'DELETE FROM clip_versions WHERE version < (SELECT clips.version FROM clips '
+                'WHERE clips.id = clip_versions.clip_id) - ?', (max_versions,)).rowcount
+        max_age_days = policy.get('max_age_days') or 0
+        if max_age_days > 0:
+            pruned += self.conn.execute('DELETE FROM clip_versions WHERE created < ?',
+                                        (time.time() - max_age_days * 86400,)).rowcount
+        return pruned
+
+    def update(self, clip_id, text):
+        with self.transaction():
+            old_text = self.full_text(clip_id)
+            if old_text is None:
+                return False
+            region = changed_region(old_text, text)
+            if region is not None:
+                start, old_end, new_end = region
+                self.save_version(clip_id, start, new_end, old_text[start:old_end], old_text)
+            chunked = len(text) > LARGE_CLIP_THRESHOLD
+            cursor = self.conn.execute(
+                'UPDATE clips SET text = ?, digest = ?, size = ?, chunked = ?, kind = NULL, updated = ?, seq = ? '
+                'WHERE id = ? AND deleted = 0',
+                (text[:CLIP_PREVIEW_CHARS] if chunked else text, self.digest(text), len(text.encode('utf-8')),
+                 int(chunked), time.time(), self.next_seq(), clip_id))
+            if cursor.rowcount == 0:
+                return False
+            if chunked:
+                self.write_chunks(clip_id, text)
+            else:
+                self.conn.execute('DELETE FROM clip_chunks WHERE clip_id = ?', (clip_id,))
+            return True
+
+    def update_region(self, clip_id, start, old_end, replacement, digest):
+        """只改写大文本中与 [start, old_end) 相交的分块，其余分块保持不动
+
+        digest 是修改后完整内容的摘要，由调用方根据内存中的文本计算。
+        """
+        with self.transaction():
+            chunks = self.conn.execute(
+                'SELECT idx, length FROM clip_chunks WHERE clip_id = ? ORDER BY idx', (clip_id,)).fetchall()
+            if not chunks:
+                return False
+            # 找出与修改区间相交的分块
+            offset = 0
+            first = last = None
+            first_offset = 0
+            for i, (idx, length) in enumerate(chunks):
+                chunk_end = offset + length
+                if first is None and (start < chunk_end or i == len(chunks) - 1):
+                    first = i
+                    first_offset = offset
+                if first is not None and (old_end <= chunk_end or i == len(chunks) - 1):
+                    last = i
+                    break
+                offset = chunk_end
+            lo = chunks[first][0]
+            hi = chunks[last + 1][0] if last + 1 < len(chunks) else None
+            old_data = ''.join(row[0] for row in self.conn.execute(
+                'SELECT data FROM clip_chunks WHERE clip_id = ? AND idx BETWEEN ? AND ? ORDER BY idx',
+                (clip_id, lo, chunks[last][0])))
+            old_slice = old_data[start - first_offset:old_end - first_offset]
+            if old_slice == replacement:
+                return True
+            self.save_version(clip_id, start, start + len(replacement), old_slice,
+                              lambda: ''.join(self.iter_chunks(clip_id)))
+            new_data = old_data[:start - first_offset] + replacement + old_data[old_end - first_offset:]
+            pieces = [new_data[i:i + CLIP_CHUNK_SIZE] for i in range(0, len(new_data), CLIP_CHUNK_SIZE)]
+            if hi is None:
+                hi = lo + (len(pieces) + 1) * CHUNK_IDX_STEP
+            step = (hi - lo) // max(1, len(pieces))
+            if step == 0:
+                # 分块序号之间没有空隙了，整体重新切块（很少发生）
+                text = ''.join(self.iter_chunks(clip_id))
+                self.write_chunks(clip_id, text[:start] + replacement + text[old_end:])
+            else:
+                self.conn.execute('DELETE FROM clip_chunks WHERE clip_id = ? AND idx BETWEEN ? AND ?',
+                                  (clip_id, lo, chunks[last][0]))
+                self.conn.executemany(
+                    'INSERT INTO clip_chunks (clip_id, idx, length, data) VALUES (?, ?, ?, ?)',
+                    ((clip_id, lo + i * step, len(piece), piece) for i, piece in enumerate(pieces)))
+            size_delta = len(new_data.encode('utf-8')) - len(old_data.encode('utf-8'))
+            preview = None
+            if start < CLIP_PREVIEW_CHARS:
+                preview = ''
+                for data in self.iter_chunks(clip_id):
+                    preview += data
+                    if len(preview) >= CLIP_PREVIEW_CHARS:
+                        break
+                preview = preview[:CLIP_PREVIEW_CHARS]
+            self.conn.execute(
+                'UPDATE clips SET text = IFNULL(?, text), digest = ?, size = size + ?, kind = NULL, '
+                'updated = ?, seq = ? WHERE id = ?',
+                (preview, digest, size_delta, time.time(), self.next_seq(), clip_id))
+            return True
+
+    def delete(self, clip_id):
+        with self.transaction():
+            cursor = self.conn.execute(
+                "UPDATE clips SET text = '', size = 0, chunked = 0, deleted = 1, updated = ?, seq = ? "
+                "WHERE id = ? AND deleted = 0",
+                (time.time(), self.next_seq(), clip_id))
+            self.conn.execute('DELETE FROM clip_chunks WHERE clip_id = ?', (clip_id,))
+            self.conn.execute('DELETE FROM clip_versions WHERE clip_id = ?', (clip_id,))
+            return cursor.rowcount > 0
+
+    def set_pinned(self, clip_id, pinned):
+        """固定的记录不受保留策略影响"""
+        with self.transaction():
+            cursor = self.conn.execute(
+                'UPDATE clips SET pinned = ?, updated = ?, seq = ? WHERE id = ? AND deleted = 0',
+                (int(bool(pinned)), time.time(), self.next_seq(), clip_id))
+            return cursor.rowcount > 0
+
+    def record_use(self, clip_id, now=None):
+        """记录一次使用（复制），只更新这一条记录的 rank 和索引项
+
+        使用不改变内容，不分配新的 seq，其他实例不会因此刷新列表。
+        """
+        with self.transaction():
+            row = self.conn.execute('SELECT rank FROM clips WHERE id = ? AND deleted = 0', (clip_id,)).fetchone()
+            if row is None:
+                return False
+            weight = ((now or time.time()) - FRECENCY_EPOCH) * FRECENCY_DECAY
+            # log(exp(rank) + exp(weight))，避免直接计算 exp 溢出
+            high, low = max(row[0], weight), min(row[0], weight)
+            rank = high + math.log1p(math.exp(low - high))
+            self.conn.execute('UPDATE clips SET rank = ?, uses = uses + 1 WHERE id = ?', (rank, clip_id))
+            return True
+
+    def delete_many(self, clip_ids):
+        """在一个事务中删除多条记录，返回删除的数量"""
+        with self.transaction():
+            return sum(self.delete(clip_id) for clip_id in clip_ids)
+
+    def set_pinned_many(self, clip_ids, pinned):
+        with self.transaction():
+            return sum(self.set_pinned(clip_id, pinned) for clip_id in clip_ids)
+
+    def all_pinned(self, clip_ids):
+        ids = list(clip_ids)
+        if not ids:
+            return False
+        return self.conn.execute(
+            f'SELECT COUNT(*) FROM clips WHERE pinned = 0 AND deleted = 0 AND id IN ({",".join("?" * len(ids))})',
+            ids).fetchone()[0] == 0
+
+    def full_texts(self, clip_ids):
+        """按添加顺序返回多条记录的完整内容，已删除的记录跳过"""
+        texts = (self.full_text(clip_id) for clip_id in sorted(clip_ids))
+        return [text for text in texts if text is not None]
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def purged_seq(self):
+        """被彻底清除的墓碑中最大的 seq，同步位置比它旧的实例需要重新读取当前页"""
+        return self.get_meta('purged_seq', 0)
+
+    def expired_ids(self, policy):
+        """按保留策略找出需要删除的记录（固定的记录除外），从旧到新"""
+        expired = set()
+        max_age_days = policy.get('max_age_days') or 0
+        if max_age_days > 0:
+            cutoff = time.time() - max_age_days * 86400
+            expired.update(row[0] for row in self.conn.execute(
+                'SELECT id FROM clips WHERE deleted = 0 AND pinned = 0 AND created < ?', (cutoff,)))
+        max_count = policy.get('max_count') or 0
+        if max_count > 0:
+            # 固定的记录也占用名额，但不会被删除
+            expired.update(row[0] for row in self.conn.execute(
+                'SELECT id FROM (SELECT id, pinned FROM clips WHERE deleted = 0 '
+                'ORDER BY id DESC LIMIT -1 OFFSET ?) WHERE pinned = 0', (max_count,)))
+        max_bytes = policy.get('max_bytes') or 0
+        if max_bytes > 0:
+            expired.update(row[0] for row in self.conn.execute(
+                'SELECT id FROM (SELECT id, pinned, SUM(size) OVER (ORDER BY id DESC) AS total '
+                'FROM clips WHERE deleted = 0) WHERE total > ? AND pinned = 0', (max_bytes,)))
+        return sorted(expired)
+
+    def apply_retention(self, policy, batch_size=200):
+        """分批删除过期记录，每批一个短事务，避免长时间占用写锁"""
+        ids = self.expired_ids(policy)
+        for start in range(0, len(ids), batch_size):
+            with self.transaction():
+                for clip_id in ids[start:start + batch_size]:
+                    self.delete(clip_id)
+        with self.transaction():
+            self.prune_versions(policy)
+        return len(ids)
+
+    def compact(self, grace=TOMBSTONE_GRACE):
+        """清除过期的墓碑并回收磁盘空间，返回清除的墓碑数量"""
+        with self.transaction():
+            cutoff = time.time() - grace
+            purged, max_purged = self.conn.execute(
+                'SELECT COUNT(*), MAX(seq) FROM clips WHERE deleted = 1 AND updated < ?', (cutoff,)).fetchone()
+            if purged:
+                self.conn.execute('DELETE FROM clips WHERE deleted = 1 AND updated < ?', (cutoff,))
+                self.set_meta('purged_seq', max(self.purged_seq(), max_purged))
+        free_pages = self.conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if free_pages:
+            auto_vacuum = self.conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+            if auto_vacuum == 2:
+                self.conn.execute('PRAGMA incremental_vacuum')
+            else:
+                # 旧数据库没有开启增量回收，整库 VACUUM 一次并顺便开启
+                self.conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                self.conn.execute('VACUUM')
+        self.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return purged
+
+    def unclassified(self, limit=200):
+        """返回还没有分类的记录 [(id, digest, text, chunked)]，大文本的 text 是开头的预览"""
+        return self.conn.execute(
+            'SELECT id, digest, text, chunked FROM clips WHERE kind IS NULL AND deleted = 0 ORDER BY id LIMIT ?',
+            (limit,)).fetchall()
+
+    def set_kinds(self, kinds):
+        """保存分类结果 [(id, digest, kind)]；分类不改变内容，不分配新的 seq
+
+        分类期间记录被编辑过时 digest 不再相同，不写入旧内容的分类，留给下一轮重新分类。
+        """
+        with self.transaction():
+            self.conn.executemany('UPDATE clips SET kind = ? WHERE id = ? AND digest = ? AND kind IS NULL',
+                                  [(kind, clip_id, digest) for clip_id, digest, kind in kinds])
+
+    @staticmethod
+    def query_conditions(query, kind=None):
+        conditions = ['deleted = 0']
+        params = []
+        if kind:
+            conditions.append('kind = ?')
+            params.append(kind)
+        if query:
+            # 大文本在分块中查找（分块按主键顺序读取），普通记录直接匹配内容
+            conditions.append('CASE WHEN chunked THEN (SELECT chunks_contain(data, ?) FROM clip_chunks '
+                              'WHERE clip_id = clips.id) ELSE contains_text(text, ?) END')
+            params.extend([query.lower(), query.lower()])
+        return conditions, params
+
+    def count(self, query='', kind=None):
+        conditions, params = self.query_conditions(query, kind)
+        return self.conn.execute(
+            f'SELECT COUNT(*) FROM clips WHERE {" AND ".join(conditions)}', params).fetchone()[0]
+
+    def page(self, query='', after=None, before=None, limit=7, at=None, by_rank=False, kind=None):
+        """keyset 分页，只读取一页需要的记录，返回 [(id, text, pinned, chunked, rank)]
+
+        默认按添加顺序排列，游标是记录的 id；by_rank 为真时按常用度从高到低排列（使用 (rank, id) 索引），
+        游标是读取时的 (rank, id)。使用会提高 rank，游标不能在查询时重新读取，否则翻页的边界会漂移。
+        kind 只读取指定类型的记录，不带搜索词时直接使用 (kind, id) 索引，不扫描内容。
+        after：读取排在游标之后的记录；at：从游标开始读取；
+        before：读取排在游标之前的最后 limit 条记录。
+        """
+        conditions, params = self.query_conditions(query, kind)
+        if by_rank:
+            key, forward, cursor_key = '(rank, id)', 'DESC', '(?, ?)'
+        else:
+            key, forward, cursor_key = 'id', 'ASC', '?'
+        after_op, before_op = ('<', '>') if forward == 'DESC' else ('>', '<')
+        backward = 'ASC' if forward == 'DESC' else 'DESC'
+        order = forward
+        for cursor, op in ((after, after_op), (at, after_op + '='), (before, before_op)):
+            if cursor is not None:
+                conditions.append(f'{key} {op} {cursor_key}')
+                params.extend(cursor if by_rank else [cursor])
+        if before is not None:
+            order = backward
+        order_by = f'rank {order}, id {order}' if by_rank else f'id {order}'
+        rows = self.conn.execute(
+            f'SELECT id, text, pinned, chunked, rank FROM clips WHERE {" AND ".join(conditions)} '
+            f'ORDER BY {order_by} LIMIT ?', params + [limit]).fetchall()
+        if order != forward:
+            rows.reverse()
+        return rows
+
+    def changes_since(self, seq):
+        """返回 seq 之后被修改过的记录 (id, deleted, seq)，按 seq 排序"""
+        return self.conn.execute(
+            'SELECT id, deleted, seq FROM clips WHERE seq > ? ORDER BY seq',
+            (seq,)).fetchall()
+
+class RetentionWorker(QThread):
+    """后台执行保留策略和数据库压缩，使用独立的数据库连接，不占用添加记录的路径"""
+    def __init__(self, path, policy, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.policy = dict(policy)
+        self.expired = 0
+        self.purged = 0
+
+    def run(self):
+        store = ClipStore(self.path)
+        try:
+            self.expired = store.apply_retention(self.policy)
+            self.purged = store.compact()
+        except sqlite3.Error as e:
+            logger.warning("清理历史记录失败: %s", e)
+        finally:
+            store.close()
+
+class IngestWorker(QThread):
+    """在后台把一批内容写入数据库（一个事务），界面通过数据库变化检测刷新"""
+    def __init__(self, path, texts, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.texts = texts
+        self.added = 0
+
+    def run(self):
+        store = ClipStore(self.path)
+        try:
+            with store.transaction():
+                for text in self.texts:
+                    if store.add(text) is not None:
+                        self.added += 1
+        except sqlite3.Error as e:
+            logger.warning("写入剪贴板历史失败: %s", e)
+        finally:
+            store.close()
+
+class TransformRunner(QObject):
+    """把转换提交到进程池执行，不占用界面线程
+
+    结果通过信号回到主线程。等待中的任务可以直接取消；已经开始执行的任务无法中断，
+    取消时终止进程池中的进程，其余未完成的任务在新的进程池中重新提交。
+    """
+    finished = pyqtSignal(int, int, str, object, str)  # 任务编号、记录 id、转换名称、结果、错误信息
+    job_done = pyqtSignal(int, object)  # 内部使用：从进程池的线程转回主线程
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.executor = None
+        self.jobs = {}  # 任务编号 -> [记录 id, 转换名称, 输入, Future]
+        self.next_job = 1
+        self.job_done.connect(self.on_job_done)
+
+    def submit(self, clip_id, key, text):
+        job_id = self.next_job
+        self.next_job += 1
+        self.jobs[job_id] = [clip_id, key, text, None]
+        self.start_job(job_id)
+        return job_id
+
+    def start_job(self, job_id):
+        if self.executor is None:
+            # 界面进程中有多个线程，fork 出的子进程可能死锁，统一使用 spawn
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=TRANSFORM_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        job = self.jobs[job_id]
+        try:
+            future = self.executor.submit(run_transform, job[1], job[2])
+        except concurrent.futures.process.BrokenProcessPool:
+            # 进程池中的进程异常退出后不能再使用，换一个新的
+            self.executor = None
+            return self.start_job(job_id)
+        job[3] = future
+        # 回调在进程池的管理线程中执行
+        future.add_done_callback(lambda f: self.job_done.emit(job_id, f))
+
+    def on_job_done(self, job_id, future):
+        job = self.jobs.get(job_id)
+        if job is None or job[3] is not future or future.cancelled():
+            return  # 已取消或已重新提交
+        del self.jobs[job_id]
+        try:
+            result, error = future.result()
+        except Exception as e:  # 进程崩溃或被终止
+            result, error = None, str(e) or type(e).__name__
+        self.finished.emit(job_id, job[0], job[1], result, error or '')
+
+    def pending_for(self, clip_id):
+        return [job_id for job_id, job in self.jobs.items() if job[0] == clip_id]
+
+    def cancel(self, job_id):
+        job = self.jobs.pop(job_id, None)
+        if job is not None and not job[3].cancel() and not job[3].done():
+            self.restart_pool()
+
+    def restart_pool(self):
+        """终止正在执行的转换，未完成的任务在新进程池中重新提交"""
+        executor, self.executor = self.executor, None
+        if executor is None:
+            return
+        for job in self.jobs.values():
+            job[3].cancel()
+        # ProcessPoolExecutor 没有公开终止进程的接口
+        for process in list((getattr(executor, '_processes', None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+        for job_id in list(self.jobs):
+            self.start_job(job_id)
+
+    def shutdown(self):
+        self.jobs.clear()
+        self.restart_pool()
+
+class ClassifyWorker(QThread):
+    """在后台给新记录分类，每批一个短事务"""
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.classified = 0
+
+    def run(self):
+        store = ClipStore(self.path)
+        try:
+            while not self.isInterruptionRequested():
+                rows = store.unclassified()
+                if not rows:
+                    break
+                store.set_kinds([(clip_id, digest, classify_text(text, complete=not chunked))
+                                 for clip_id, digest, text, chunked in rows])
+                self.classified += len(rows)
+        except sqlite3.Error as e:
+            logger.warning("记录分类失败: %s", e)
+        finally:
+            store.close()
+
+class ClipCountWorker(QThread):
+    """在后台统计搜索结果总数，分页本身不依赖这个数字"""
+    counted = pyqtSignal(str, int)
+
+    def __init__(self, path, query, kind=None, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.query = query
+        self.kind = kind
+
+    def run(self):
+        store = ClipStore(self.path)
+        try:
+            self.counted.emit(self.query, store.count(self.query, self.kind))
+        except sqlite3.Error as e:
+            logger.warning("统计记录数失败: %s", e)
+        finally:
+            store.close()
+
+class IpcServer(QObject):
+    """本地 IPC 服务
+
+    协议：每个请求/响应都是 4 字节大端长度 + UTF-8 JSON。
+    JSON 为单个请求对象时返回单个响应对象，为列表时按批处理并返回响应列表。
+    """
+    def __init__(self, handler, parent=None):
+        super().__init__(parent)
+        self.handler = handler
+        self.buffers = {}
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        self.server.newConnection.connect(self.on_new_connection)
+
+    def listen(self, name=IPC_SERVER_NAME):
+        if self.server.listen(name):
+            return True
+        # 上次异常退出可能留下了失效的套接字文件；仍有实例在监听时不能删除
+        probe = QLocalSocket()
+        probe.connectToServer(name)
+        if probe.waitForConnected(500):
+            probe.disconnectFromServer()
+            logger.warning("已有实例在监听 %s", name)
+            return False
+        QLocalServer.removeServer(name)
+        if self.server.listen(name):
+            return True
+        logger.warning("IPC 服务启动失败: %s", self.server.errorString())
+        return False
+
+    def on_new_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            self.buffers[socket] = bytearray()
+            socket.readyRead.connect(lambda socket=socket: self.on_ready_read(socket))
+            socket.disconnected.connect(lambda socket=socket: self.on_disconnected(socket))
+
+    def on_disconnected(self, socket):
+        self.buffers.pop(socket, None)
+        socket.deleteLater()
+
+    def on_ready_read(self, socket):
+        buffer = self.buffers.get(socket)
+        if buffer is None:
+            return
+        buffer += socket.readAll().data()
+        while len(buffer) >= 4:
+            (length,) = struct.unpack('>I', buffer[:4])
+            if length > IPC_MAX_FRAME:
+                logger.warning("IPC 请求过大 (%d 字节)，断开连接", length)
+                socket.abort()
+                return
+            if len(buffer) < 4 + length:
+                break
+            frame = bytes(buffer[4:4 + length])
+            del buffer[:4 + length]
+            try:
+                request = json.loads(frame.decode('utf-8'))
+                response = self.handler(request)
+            except Exception as e:
+                response = {'ok': False, 'error': str(e)}
+            socket.write(encode_ipc_frame(response))
+
+def encode_ipc_frame(payload):
+    data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    return struct.pack('>I', len(data)) + data
+
+def send_ipc_request(payload, timeout=3000, name=IPC_SERVER_NAME):
+    """向正在运行的实例发送请求并等待响应，没有运行中的实例时返回 None"""
+    socket = QLocalSocket()
+    socket.connectToServer(name)
+    if not socket.waitForConnected(timeout):
+        return None
+    socket.write(encode_ipc_frame(payload))
+    socket.waitForBytesWritten(timeout)
+    response = read_ipc_frame(socket, bytearray(), timeout)
+    socket.disconnectFromServer()
+    return response
+
+def read_ipc_frame(socket, buffer, timeout=3000):
+    """从已连接的套接字读取一个响应；buffer 中多读的数据留给下一次调用"""
+    while True:
+        if len(buffer) >= 4:
+            (length,) = struct.unpack('>I', buffer[:4])
+            if len(buffer) >= 4 + length:
+                frame = bytes(buffer[4:4 + length])
+                del buffer[:4 + length]
+                return json.loads(frame.decode('utf-8'))
+        if not socket.waitForReadyRead(timeout):
+            raise TimeoutError("等待 IPC 响应超时")
+        buffer += socket.readAll().data()
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="悬浮剪切板")
+    parser.add_argument('--push', action='append', default=[], metavar='TEXT',
+                        help="把文本添加到剪贴板历史（可重复）")
+    parser.add_argument('--watchdog', action='store_true',
+                        help="开启主线程卡顿监视，卡顿时的调用栈写入 stalls.log")
+    return parser
+
+class FloatBall(QWidget):
+    """快速打开模式使用的独立悬浮球
+
+    主窗口收缩时只是隐藏起来，保留展开状态的布局和样式，由这个小窗口代替显示悬浮球。
+    """
+    def __init__(self, manager):
+        super().__init__(None, Qt.WindowType.FramelessWindowHint | Qt.WindowType.WindowStaysOnTopHint |
+                         Qt.WindowType.Tool)
+        self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
+        self.manager = manager
+        self.setFixedSize(manager.collapsed_size)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        self.manager.paint_float_ball(painter, self.rect())
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self.manager.show_window(instant=True)
+
 class ClipboardManager(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -433,7 +2133,13 @@ class ClipboardManager(QMainWindow):
         # 创建托盘菜单
         tray_menu = QMenu()
         show_action = tray_menu.addAction("显示")
-        show_action.triggered.connect(self.show_window)
+        show_action.triggered.connect(lambda: self.show_window())
+        self.instant_open_action = tray_menu.addAction("快速打开模式")
+        self.instant_open_action.setCheckable(True)
+        self.instant_open_action.toggled.connect(self.set_instant_open)
+        self.sort_by_rank_action = tray_menu.addAction("常用优先")
+        self.sort_by_rank_action.setCheckable(True)
+        self.sort_by_rank_action.toggled.connect(self.set_sort_by_rank)
         quit_action = tray_menu.addAction("退出")
         quit_action.triggered.connect(self.close_application)
         
@@ -441,8 +2147,32 @@ class ClipboardManager(QMainWindow):
         self.tray_icon.show()
         
         # 初始化界面状态
-        self.clips = []
-        self.filtered_clips = []
+        self.page_records = []  # 当前页的记录 [(id, 文本, 是否固定, 是否分块, rank)]
+        self.has_next_page = False
+        self.total_count = None  # 搜索结果总数，后台统计完成前为 None
+        self.count_worker = None
+        self.count_dirty = False
+        self.retention = dict(DEFAULT_RETENTION)
+        self.retention_worker = None
+        self.is_collapsed = False
+        self.original_size = None
+        self.is_animating = False  # 添加动画状态标记
+        self.instant_open_enabled = False  # 快速打开模式：收缩后窗口保持布局，打开时不播放动画
+        self.collapsed_to_ball_window = False  # 当前是否由独立的悬浮球窗口代替主窗口
+        self.pending_open = None  # (触发时间, 打开方式)，首帧绘制时记录延迟
+        self.open_latencies = deque(maxlen=100)  # 最近若干次打开的 (方式, 毫秒)
+        self.inserts_since_retention = 0
+        self.selected_ids = set()  # 多选的记录，翻页和搜索时保留
+        self.sort_by_rank = False  # 常用优先：按使用频率和最近使用时间排序
+        self.kind_filter = None  # 类型筛选，None 表示全部
+        self.classify_worker = None
+        self.ingest_queue = IngestQueue()
+        self.ingest_worker = None
+        self.transform_runner = TransformRunner(self)
+        self.transform_runner.finished.connect(self.on_transform_finished)
+        self.watchdog = None  # 卡顿监视器，需要时才创建
+        self.watchdog_settings = {'enabled': False, 'threshold_ms': 250}
+        self.legacy_clips = None  # 旧版本 settings.json 中还没有导入数据库的历史
         self.current_page = 0
         self.items_per_page = 7
         self.dragging = False
@@ -472,16 +2202,32 @@ class ClipboardManager(QMainWindow):
         # 初始化UI
         self.init_ui()
         self.load_settings()
-        
-        self.is_collapsed = False
-        self.original_size = None
-        self.is_animating = False  # 添加动画状态标记
-        
+
+        # 截图动画：展开状态的截图在收缩时缓存，展开时直接复用
+        self.expanded_snapshot = None
+        self.snapshot_animator = SnapshotAnimator()
+        self.snapshot_animator.finished.connect(self.on_snapshot_animation_finished)
+        self.animation_finished_callback = None
+        self.animation_stats = deque(maxlen=50)  # 最近若干次动画的帧统计
+        
+        self.float_ball = FloatBall(self)
+        self.prewarm_timer = QTimer(self)
+        self.prewarm_timer.setSingleShot(True)
+        self.prewarm_timer.setInterval(100)
+        self.prewarm_timer.timeout.connect(self.prewarm)
+        self.instant_open_action.setChecked(self.instant_open_enabled)
+        self.sort_by_rank_action.setChecked(self.sort_by_rank)
+        self.set_watchdog(self.watchdog_settings['enabled'])
+
         # 添加检测窗口位置的定时器
         self.check_position_timer = QTimer(self)
         self.check_position_timer.timeout.connect(self.check_window_position)
         self.check_position_timer.start(100)  # 每100ms检查一次
         
+        # 本地 IPC 服务，供其他进程推送/查询，同时保证单实例
+        self.ipc_server = IpcServer(self.handle_ipc_request, self)
+        self.ipc_server.listen()
+        
     def init_ui(self):
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
@@ -522,6 +2268,9 @@ class ClipboardManager(QMainWindow):
         # 内容区域
         self.create_content_area()
         
+        # 多选操作栏，有选中的记录时显示
+        self.create_selection_bar()
+        
         # 分页控制
         self.create_pagination_controls()
         
@@ -587,6 +2336,163 @@ class ClipboardManager(QMainWindow):
         
         search_layout.addWidget(self.search_input)
         self.layout.addWidget(search_container)
+        self.create_kind_filter()
+        
+    def create_kind_filter(self):
+        """搜索框下方的类型筛选按钮，窗口较窄时可以横向滚动"""
+        chips = QWidget()
+        chips.setStyleSheet("background: transparent;")
+        chips_layout = QHBoxLayout(chips)
+        chips_layout.setContentsMargins(0, 0, 0, 0)
+        chips_layout.setSpacing(4)
+        
+        self.kind_buttons = QButtonGroup(self)
+        self.kind_buttons.setExclusive(True)
+        for kind, label in [(None, "全部")] + CLIP_KINDS:
+            button = QPushButton(label)
+            button.setCheckable(True)
+            button.setChecked(kind is None)
+            button.setFixedHeight(22)
+            button.setStyleSheet("""
+                QPushButton {
+                    background-color: #ecf0f1;
+                    border: none;
+                    border-radius: 11px;
+                    padding: 2px 8px;
+                    color: #2c3e50;
+                    font-size: 11px;
+                }
+                QPushButton:hover {
+                    background-color: #dbeafe;
+                }
+                QPushButton:checked {
+                    background-color: #3b82f6;
+                    color: white;
+                }
+            """)
+            button.clicked.connect(lambda checked=False, k=kind: self.set_kind_filter(k))
+            self.kind_buttons.addButton(button)
+            chips_layout.addWidget(button)
+        chips_layout.addStretch()
+        
+        scroll = QScrollArea()
+        scroll.setWidget(chips)
+        scroll.setWidgetResizable(True)
+        scroll.setFixedHeight(30)
+        scroll.setFrameShape(QFrame.Shape.NoFrame)
+        scroll.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        scroll.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
+        scroll.setStyleSheet("""
+            QScrollArea {
+                background: transparent;
+            }
+            QScrollBar:horizontal {
+                height: 4px;
+                background: transparent;
+            }
+            QScrollBar::handle:horizontal {
+                background: #cbd5e1;
+                border-radius: 2px;
+            }
+            QScrollBar::add-line:horizontal, QScrollBar::sub-line:horizontal {
+                width: 0px;
+            }
+        """)
+        self.layout.addWidget(scroll)
+        
+    def set_kind_filter(self, kind):
+        if kind != self.kind_filter:
+            self.kind_filter = kind
+            self.search_clips(self.search_input.text())
+        
+    def create_selection_bar(self):
+        self.selection_bar = QWidget()
+        selection_layout = QHBoxLayout(self.selection_bar)
+        selection_layout.setContentsMargins(0, 0, 0, 0)
+        
+        self.selection_label = QLabel()
+        self.selection_label.setStyleSheet("""
+            QLabel {
+                color: #2c3e50;
+                padding: 0 4px;
+            }
+        """)
+        selection_layout.addWidget(self.selection_label)
+        selection_layout.addStretch()
+        
+        buttons = [("复制", self.batch_copy), ("固定", self.batch_pin),
+                   ("删除", self.batch_delete), ("取消", self.clear_selection)]
+        for text, slot in buttons:
+            button = QPushButton(text)
+            button.setFixedHeight(28)
+            button.setStyleSheet("""
+                QPushButton {
+                    background-color: #ecf0f1;
+                    border: none;
+                    border-radius: 4px;
+                    padding: 4px 10px;
+                    color: #2c3e50;
+                }
+                QPushButton:hover {
+                    background-color: #bdc3c7;
+                }
+            """)
+            button.clicked.connect(slot)
+            selection_layout.addWidget(button)
+            
+        self.selection_bar.hide()
+        self.layout.addWidget(self.selection_bar)
+        
+    def update_selection_bar(self):
+        self.selection_label.setText(f"已选 {len(self.selected_ids)} 项")
+        self.selection_bar.setVisible(bool(self.selected_ids))
+        
+    def toggle_selection(self, clip_id):
+        """切换选中状态，只更新对应的条目，不重建列表"""
+        if clip_id in self.selected_ids:
+            self.selected_ids.discard(clip_id)
+        else:
+            self.selected_ids.add(clip_id)
+        for item in self.content_widget.findChildren(ClipItem):
+            if item.clip_id == clip_id:
+                item.set_selected(clip_id in self.selected_ids)
+        self.update_selection_bar()
+        
+    def clear_selection(self):
+        self.selected_ids.clear()
+        for item in self.content_widget.findChildren(ClipItem):
+            if item.selected:
+                item.set_selected(False)
+        self.update_selection_bar()
+        
+    def batch_copy(self):
+        """按添加顺序把选中的记录拼接后复制到剪贴板"""
+        texts = self.store.full_texts(self.selected_ids)
+        if texts:
+            pyperclip.copy('\n'.join(text.strip() for text in texts))
+            with self.store.transaction():
+                for clip_id in self.selected_ids:
+                    self.store.record_use(clip_id)
+        self.clear_selection()
+        
+    def batch_pin(self):
+        """选中的记录全部已固定时取消固定，否则全部固定"""
+        pinned = not self.store.all_pinned(self.selected_ids)
+        self.store.set_pinned_many(self.selected_ids, pinned)
+        self.selected_ids.clear()
+        self.search_clips(self.search_input.text())
+        
+    def batch_delete(self):
+        dialog = CustomMessageBox(self, f"确定要删除选中的 {len(self.selected_ids)} 条记录吗？")
+        center = self.geometry().center()
+        dialog.move(center.x() - dialog.width() // 2,
+                    center.y() - dialog.height() // 2)
+        accepted = dialog.exec() == QDialog.DialogCode.Accepted
+        dialog.deleteLater()
+        if accepted:
+            self.store.delete_many(self.selected_ids)
+            self.selected_ids.clear()
+            self.search_clips(self.search_input.text())
         
     def create_pagination_controls(self):
         pagination = QWidget()
@@ -633,31 +2539,98 @@ class ClipboardManager(QMainWindow):
         
     def search_clips(self, text):
         self.current_page = 0
-        if text:
-            self.filtered_clips = [clip for clip in self.clips if text.lower() in clip.lower()]
+        self.load_page()
+        self.update_clips_display()
+        self.request_count()
+        self.schedule_classify()
+        
+    def page_cursor(self, record):
+        """记录在当前排序下的翻页游标：常用优先时是读取时的 (rank, id)，否则是 id"""
+        return (record[4], record[0]) if self.sort_by_rank else record[0]
+        
+    def load_page(self, after=None, before=None, at=None):
+        """按游标读取一页记录，多读一条用来判断是否还有下一页"""
+        query = self.search_input.text()
+        if before is not None:
+            self.page_records = self.store.page(query, before=before, limit=self.items_per_page,
+                                                by_rank=self.sort_by_rank, kind=self.kind_filter)
+            self.has_next_page = bool(self.page_records) and bool(
+                self.store.page(query, after=self.page_cursor(self.page_records[-1]), limit=1,
+                                by_rank=self.sort_by_rank, kind=self.kind_filter))
         else:
-            self.filtered_clips = self.clips.copy()
+            rows = self.store.page(query, after=after, at=at, limit=self.items_per_page + 1,
+                                   by_rank=self.sort_by_rank, kind=self.kind_filter)
+            self.has_next_page = len(rows) > self.items_per_page
+            self.page_records = rows[:self.items_per_page]
+        
+    def refresh_current_page(self):
+        """数据变化后重新读取当前页，不回到第一页"""
+        if self.current_page > 0 and self.page_records:
+            first = self.page_cursor(self.page_records[0])
+            self.load_page(at=first)
+            if not self.page_records:
+                # 当前页的记录都被删除了，退回上一页
+                self.current_page -= 1
+                if self.current_page == 0:
+                    self.load_page()
+                else:
+                    self.load_page(before=first)
+        else:
+            self.current_page = 0
+            self.load_page()
         self.update_clips_display()
+        self.request_count()
         
     def prev_page(self):
         if self.current_page > 0:
             self.current_page -= 1
+            if self.current_page == 0:
+                self.load_page()
+            else:
+                self.load_page(before=self.page_cursor(self.page_records[0]))
             self.update_clips_display()
             
     def next_page(self):
-        max_pages = (len(self.filtered_clips) - 1) // self.items_per_page
-        if self.current_page < max_pages:
+        if self.has_next_page and self.page_records:
             self.current_page += 1
+            self.load_page(after=self.page_cursor(self.page_records[-1]))
             self.update_clips_display()
             
+    def request_count(self):
+        """总数只用于显示页码，放到后台线程统计"""
+        self.total_count = None
+        if self.count_worker is not None and self.count_worker.isRunning():
+            self.count_dirty = True
+            return
+        self.count_dirty = False
+        self.count_worker = ClipCountWorker(self.store.path, self.search_input.text(), self.kind_filter, self)
+        self.count_worker.counted.connect(self.on_count_finished)
+        self.count_worker.finished.connect(self.on_count_worker_finished)
+        self.count_worker.start(QThread.Priority.LowPriority)
+        
+    def on_count_finished(self, query, count):
+        if query == self.search_input.text() and self.sender().kind == self.kind_filter and not self.count_dirty:
+            self.total_count = count
+            self.update_pagination_buttons()
+            
+    def on_count_worker_finished(self):
+        # 每次统计都会创建新的线程对象，结束后释放，否则会一直挂在窗口上
+        worker = self.sender()
+        worker.deleteLater()
+        if worker is self.count_worker:
+            self.count_worker = None
+        if self.count_dirty:
+            self.request_count()
+            
     def update_pagination_buttons(self):
-        total_pages = max(1, (len(self.filtered_clips) - 1) // self.items_per_page + 1)
-        self.page_label.setText(f"{self.current_page + 1}/{total_pages}")
+        if self.total_count is None:
+            self.page_label.setText(f"{self.current_page + 1}/…")
+        else:
+            total_pages = max(1, (self.total_count - 1) // self.items_per_page + 1)
+            self.page_label.setText(f"{self.current_page + 1}/{total_pages}")
         
         self.prev_button.setEnabled(self.current_page > 0)
-        self.next_button.setEnabled(
-            self.current_page < (len(self.filtered_clips) - 1) // self.items_per_page
-        )
+        self.next_button.setEnabled(self.has_next_page)
         
     def create_title_bar(self):
         self.title_bar = QWidget()
@@ -753,48 +2726,368 @@ class ClipboardManager(QMainWindow):
         
     def add_clip(self):
         content = pyperclip.paste()
-        if content:
-            # 去除前后的空格和换行
-            cleaned_content = content.strip()
-            if cleaned_content and cleaned_content not in self.clips:
-                self.clips.append(cleaned_content)
-                if len(self.clips) > 100:  # 增加最大存储量
-                    self.clips.pop(0)
-                self.search_clips(self.search_input.text())
-            
-    def delete_clip(self, text):
-        if text in self.clips:
-            self.clips.remove(text)
+        if content and self.insert_clip(content):
+            self.search_clips(self.search_input.text())
+            
+    def insert_clip(self, content):
+        """把文本加入历史但不刷新界面，返回是否新增了记录"""
+        # 去除前后的空格和换行
+        cleaned_content = content.strip()
+        if not cleaned_content:
+            return False
+        clip_id = self.store.add(cleaned_content)
+        if clip_id is None:
+            return False
+        # 保留策略在后台执行，添加路径上只计数
+        self.inserts_since_retention += 1
+        if self.inserts_since_retention >= 50:
+            self.schedule_retention()
+        return True
+            
+    def handle_ipc_request(self, request):
+        """处理 IPC 请求，批量请求只在最后刷新一次界面"""
+        if isinstance(request, list):
+            # 整个批次在一个事务中完成
+            with self.store.transaction():
+                results = [self.process_ipc_request(item) for item in request]
+            responses = [response for response, _ in results]
+            changed = any(changed for _, changed in results)
+        else:
+            response, changed = self.process_ipc_request(request)
+            responses = response
+        if changed:
+            self.search_clips(self.search_input.text())
+        return responses
+        
+    def process_ipc_request(self, request):
+        """执行单个请求，返回 (响应, 是否修改了历史)"""
+        if not isinstance(request, dict):
+            return {'ok': False, 'error': "请求必须是 JSON 对象"}, False
+        op = request.get('op')
+        try:
+            if op == 'push':
+                status = self.enqueue_clip(str(request.get('text', '')))
+                return {'ok': True, 'status': status}, False
+            if op == 'search':
+                # keyset 分页：把上一次响应中的 next 作为 after 传入即可读取下一页
+                # 按常用度排序时 next 是 [rank, id]，使用记录不会让后面的页漂移
+                query = str(request.get('query', ''))
+                after = request.get('after')
+                limit = max(1, min(int(request.get('limit', 20)), 1000))
+                kind = request.get('kind')
+                by_rank = request.get('order') == 'rank'
+                if after is not None:
+                    if by_rank:
+                        rank, after_id = after
+                        after = (float(rank), int(after_id))
+                    else:
+                        after = int(after)
+                rows = self.store.page(query, after=after, limit=limit + 1, by_rank=by_rank, kind=kind)
+                # 大文本只返回开头的预览（truncated 为 true），完整内容用 get 读取
+                items = [{'id': clip_id, 'text': text, 'pinned': bool(pinned), 'truncated': bool(chunked)}
+                         for clip_id, text, pinned, chunked, _ in rows[:limit]]
+                next_cursor = None
+                if len(rows) > limit:
+                    last = rows[limit - 1]
+                    next_cursor = [last[4], last[0]] if by_rank else last[0]
+                response = {'ok': True, 'items': items, 'next': next_cursor}
+                if request.get('count'):
+                    response['total'] = self.store.count(query, kind)
+                return response, False
+            if op == 'get':
+                record = self.store.record(int(request['id']))
+                if record is None:
+                    return {'ok': False, 'error': "记录不存在"}, False
+                clip_id, _, pinned, _ = record
+                if request.get('version') is not None:
+                    text = self.store.version_text(clip_id, int(request['version']))
+                    if text is None:
+                        return {'ok': False, 'error': "版本不存在"}, False
+                else:
+                    text = self.store.full_text(clip_id)
+                return {'ok': True, 'id': clip_id, 'text': text, 'pinned': bool(pinned)}, False
+            if op == 'versions':
+                versions = self.store.versions(int(request['id']))
+                return {'ok': True, 'versions': [{'version': version, 'created': created}
+                                                 for version, created in versions]}, False
+            if op == 'restore':
+                changed = self.store.restore_version(int(request['id']), int(request['version']))
+                return {'ok': True, 'changed': changed}, changed
+            if op == 'delete':
+                if 'id' in request:
+                    clip_id = int(request['id'])
+                else:
+                    clip_id = self.store.find_id(str(request.get('text', '')))
+                deleted = clip_id is not None and self.store.delete(clip_id)
+                return {'ok': True, 'deleted': deleted}, deleted
+            if op == 'use':
+                # 外部工具粘贴记录后可以用它记录一次使用，不会刷新界面
+                used = self.store.record_use(int(request['id']))
+                return {'ok': True, 'used': used}, False
+            if op == 'pin':
+                changed = self.store.set_pinned(int(request['id']), request.get('pinned', True))
+                return {'ok': True, 'changed': changed}, changed
+            if op == 'show':
+                instant = request.get('instant')
+                self.show_window(instant=None if instant is None else bool(instant))
+                return {'ok': True}, False
+            if op == 'stats':
+                return {'ok': True, 'animations': list(self.animation_stats),
+                        'open_latency_ms': [{'mode': mode, 'ms': ms} for mode, ms in self.open_latencies],
+                        'open_latency_budget_ms': OPEN_LATENCY_BUDGET_MS,
+                        'stalls': self.watchdog.stats() if self.watchdog else None,
+                        'ingest': self.ingest_queue.stats(), 'rss_bytes': process_rss()}, False
+            if op == 'args':
+                self.handle_args(build_arg_parser().parse_args(request.get('argv', [])))
+                return {'ok': True}, False
+        except (KeyError, ValueError, TypeError) as e:
+            return {'ok': False, 'error': f"参数错误: {e}"}, False
+        except SystemExit:
+            return {'ok': False, 'error': "无法解析命令行参数"}, False
+        return {'ok': False, 'error': f"未知操作: {op}"}, False
+        
+    def handle_args(self, args):
+        """处理命令行参数（包括其他实例转交过来的）；推送的内容进入写入队列"""
+        for text in args.push:
+            self.enqueue_clip(text)
+        if args.watchdog:
+            self.set_watchdog(True)
+        if not args.push:
+            self.show_window()
+            
+    def delete_clip(self, clip_id):
+        if self.store.delete(clip_id):
             self.search_clips(self.search_input.text())
             
     def update_clips_display(self):
-        # 清除现有内容
-        for i in reversed(range(self.content_layout.count())): 
-            self.content_layout.itemAt(i).widget().setParent(None)
+        # 清除现有内容：条目可能正在处理自己的事件（例如在右键菜单中删除），延迟到事件循环中销毁
+        while self.content_layout.count():
+            widget = self.content_layout.takeAt(0).widget()
+            widget.hide()
+            widget.deleteLater()
             
-        # 计算当前页的内容
-        start_idx = self.current_page * self.items_per_page
-        end_idx = start_idx + self.items_per_page
-        current_page_clips = self.filtered_clips[start_idx:end_idx]
+        # 当前页的内容已经由 load_page 按游标读取
+        current_page_clips = self.page_records
         
         # 添加内容，如果不足7个则添加空白项
         for i in range(self.items_per_page):
             if i < len(current_page_clips):
-                clip_item = ClipItem(current_page_clips[i], self.content_widget, self)
+                clip_id, text, pinned, chunked, _ = current_page_clips[i]
+                clip_item = ClipItem(clip_id, text, self.content_widget, self,
+                                     pinned=bool(pinned), chunked=bool(chunked),
+                                     selected=clip_id in self.selected_ids)
                 self.content_layout.addWidget(clip_item)
             else:
                 empty_item = EmptyClipItem(self.content_widget)
                 self.content_layout.addWidget(empty_item)
             
-        # 更新分页按钮状态
+        # 更新分页按钮和多选操作栏
         self.update_pagination_buttons()
+        self.update_selection_bar()
+        self.schedule_prewarm()
         
-    def edit_clip(self, old_text, new_text):
-        if old_text in self.clips:
-            index = self.clips.index(old_text)
-            self.clips[index] = new_text
+    def pin_clip(self, clip_id, pinned):
+        if self.store.set_pinned(clip_id, pinned):
+            self.search_clips(self.search_input.text())
+            
+    def clip_text(self, clip_id):
+        """读取记录的完整内容（大文本从分块中拼接）"""
+        return self.store.full_text(clip_id) or ''
+        
+    def edit_clip_region(self, clip_id, start, old_end, replacement, new_text):
+        """保存大文本的修改，分块存储的记录只改写变化区间所在的分块"""
+        if (self.store.update_region(clip_id, start, old_end, replacement, ClipStore.digest(new_text))
+                or self.store.update(clip_id, new_text)):
+            self.search_clips(self.search_input.text())
+            
+    def edit_clip(self, clip_id, new_text):
+        if self.store.update(clip_id, new_text):
             self.search_clips(self.search_input.text())
             
+    def restore_version(self, clip_id, version):
+        if self.store.restore_version(clip_id, version):
+            self.search_clips(self.search_input.text())
+            
+    def init_store(self):
+        """打开共享的历史数据库，并监听其他实例的修改"""
+        self.store = ClipStore(config_dir() / 'clips.db')
+        self.synced_seq = 0
+        self.synced_data_version = None
+        
+        # 文件变化时尽快同步；监听目录是为了在 WAL 文件重新创建后继续监听
+        self.store_watcher = QFileSystemWatcher(self)
+        self.watch_store_files()
+        self.store_watcher.fileChanged.connect(self.schedule_store_sync)
+        self.store_watcher.directoryChanged.connect(self.schedule_store_sync)
+        self.store_sync_timer = QTimer(self)
+        self.store_sync_timer.setSingleShot(True)
+        self.store_sync_timer.setInterval(30)
+        self.store_sync_timer.timeout.connect(self.check_store_changes)
+        
+        # 某些文件系统（如网络目录）不会发出通知，定时检查 data_version 作为兜底
+        self.store_poll_timer = QTimer(self)
+        self.store_poll_timer.timeout.connect(self.check_store_changes)
+        self.store_poll_timer.start(300)
+        
+        # 新记录稍后在后台分类，启动时顺便补上旧记录的分类
+        self.classify_timer = QTimer(self)
+        self.classify_timer.setSingleShot(True)
+        self.classify_timer.setInterval(200)
+        self.classify_timer.timeout.connect(self.start_classify)
+        
+        # 推送的内容攒一小段时间后由后台线程分批写入
+        self.ingest_timer = QTimer(self)
+        self.ingest_timer.setSingleShot(True)
+        self.ingest_timer.setInterval(INGEST_DRAIN_INTERVAL_MS)
+        self.ingest_timer.timeout.connect(self.drain_ingest_queue)
+        
+        # 启动后稍等片刻执行一次保留策略，之后每 10 分钟一次
+        self.retention_timer = QTimer(self)
+        self.retention_timer.timeout.connect(self.schedule_retention)
+        self.retention_timer.start(10 * 60 * 1000)
+        QTimer.singleShot(5000, self.schedule_retention)
+        
+    def schedule_classify(self):
+        """新记录在后台分类；历史发生变化后调用，没有未分类的记录时很快结束"""
+        if not self.classify_timer.isActive():
+            self.classify_timer.start()
+            
+    def start_classify(self):
+        if self.classify_worker is not None and self.classify_worker.isRunning():
+            self.classify_timer.start()
+            return
+        self.classify_worker = ClassifyWorker(self.store.path, self)
+        self.classify_worker.finished.connect(self.on_classify_finished)
+        self.classify_worker.start(QThread.Priority.LowPriority)
+        
+    def on_classify_finished(self):
+        worker = self.sender()
+        worker.deleteLater()
+        if worker is self.classify_worker:
+            self.classify_worker = None
+        # 正在按类型筛选时，新分类的记录需要显示出来
+        if worker.classified and self.kind_filter is not None:
+            self.refresh_current_page()
+        
+    def enqueue_clip(self, content):
+        """把外部推送的内容放入写入队列，返回 'queued'、'coalesced' 或 'dropped'
+
+        队列有上限，推送过快时按策略丢弃，内存不会无限增长；写入在后台线程中进行，
+        界面在数据库变化后刷新，推送本身不会阻塞界面。
+        """
+        cleaned_content = content.strip()
+        if not cleaned_content:
+            return 'dropped'
+        status = self.ingest_queue.put(cleaned_content)
+        if status == 'queued' and not self.ingest_timer.isActive():
+            self.ingest_timer.start()
+        return status
+        
+    def drain_ingest_queue(self):
+        if not self.ingest_queue or (self.ingest_worker is not None and self.ingest_worker.isRunning()):
+            return
+        self.ingest_worker = IngestWorker(self.store.path, self.ingest_queue.take(), self)
+        self.ingest_worker.finished.connect(self.on_ingest_finished)
+        self.ingest_worker.start()
+        
+    def on_ingest_finished(self):
+        worker = self.sender()
+        worker.deleteLater()
+        if worker is self.ingest_worker:
+            self.ingest_worker = None
+        self.ingest_queue.counters['written'] += worker.added
+        self.inserts_since_retention += worker.added
+        if self.inserts_since_retention >= 50:
+            self.schedule_retention()
+        if self.ingest_queue:
+            # 持续推送时由文件监听和定时检查刷新界面，每批不单独刷新
+            self.drain_ingest_queue()
+        else:
+            self.check_store_changes()
+        
+    def transform_clip(self, clip_id, key):
+        text = self.clip_text(clip_id)
+        if len(text) > TRANSFORM_MAX_INPUT_CHARS:
+            self.notify("无法转换", f"内容超过 {TRANSFORM_MAX_INPUT_CHARS // (1024 * 1024)}M 字符")
+            return None
+        return self.transform_runner.submit(clip_id, key, text)
+        
+    def cancel_transforms(self, clip_id):
+        for job_id in self.transform_runner.pending_for(clip_id):
+            self.transform_runner.cancel(job_id)
+            
+    def on_transform_finished(self, job_id, clip_id, key, result, error):
+        label = TRANSFORMS[key][0]
+        if error:
+            self.notify(f"{label}失败", error)
+        elif result and self.enqueue_clip(result) == 'dropped':
+            self.notify(f"{label}失败", "写入队列已满，请稍后重试")
+            
+    def notify(self, title, message):
+        """不打断操作的提示，显示为托盘通知"""
+        self.tray_icon.showMessage(title, message, QSystemTrayIcon.MessageIcon.Information, 3000)
+        
+    def flush_ingest_queue(self):
+        """退出前把队列中剩余的内容写入数据库"""
+        if self.ingest_worker is not None:
+            self.ingest_worker.wait()
+        with self.store.transaction():
+            while self.ingest_queue:
+                for text in self.ingest_queue.take():
+                    self.store.add(text)
+        
+    def schedule_retention(self):
+        """在低优先级后台线程中执行保留策略并压缩数据库"""
+        if self.retention_worker is not None and self.retention_worker.isRunning():
+            return
+        self.inserts_since_retention = 0
+        self.retention_worker = RetentionWorker(self.store.path, self.retention, self)
+        self.retention_worker.finished.connect(self.on_retention_finished)
+        self.retention_worker.start(QThread.Priority.LowestPriority)
+        
+    def on_retention_finished(self):
+        worker = self.sender()
+        worker.deleteLater()
+        if worker is self.retention_worker:
+            self.retention_worker = None
+        if worker.expired or worker.purged:
+            logger.info("保留策略清理了 %d 条记录，压缩了 %d 个墓碑", worker.expired, worker.purged)
+        self.check_store_changes()
+        
+    def watch_store_files(self):
+        paths = [str(self.store.path.parent)]
+        for suffix in ('', '-wal'):
+            path = Path(str(self.store.path) + suffix)
+            if path.exists():
+                paths.append(str(path))
+        missing = [p for p in paths if p not in self.store_watcher.files() + self.store_watcher.directories()]
+        if missing:
+            self.store_watcher.addPaths(missing)
+            
+    def schedule_store_sync(self, path=None):
+        self.watch_store_files()
+        self.store_sync_timer.start()
+        
+    def check_store_changes(self):
+        """其他实例提交过修改时才去读取变化的记录"""
+        if self.store.data_version() != self.synced_data_version:
+            self.sync_from_store()
+        
+    def sync_from_store(self):
+        """只读取上次同步之后被修改过的记录，有变化时重新读取当前页"""
+        self.synced_data_version = self.store.data_version()
+        if self.store.purged_seq() > self.synced_seq:
+            # 有未同步的删除已经被压缩掉了，无法增量得知，直接重新读取当前页
+            self.synced_seq = self.store.max_seq()
+        else:
+            changes = self.store.changes_since(self.synced_seq)
+            if not changes:
+                return False
+            self.synced_seq = changes[-1][2]
+        self.refresh_current_page()
+        self.schedule_classify()
+        return True
+            
     def mousePressEvent(self, event):
         if self.is_collapsed and event.button() == Qt.MouseButton.LeftButton:
             self.expand_from_float_ball()
@@ -806,6 +3099,7 @@ class ClipboardManager(QMainWindow):
         pass
         
     def save_settings(self):
+        # 剪贴板历史保存在数据库中，这里只保存窗口设置
         settings = {
             'geometry': {
                 'x': self.x(),
@@ -813,17 +3107,26 @@ class ClipboardManager(QMainWindow):
                 'width': self.width(),
                 'height': self.height()
             },
-            'clips': self.clips
+            'retention': self.retention,
+            'instant_open': self.instant_open_enabled,
+            'sort_by_rank': self.sort_by_rank,
+            'watchdog': self.watchdog_settings
         }
-        
-        config_dir = Path.home() / '.clipboard_manager'
-        config_dir.mkdir(exist_ok=True)
-        
-        with open(config_dir / 'settings.json', 'w', encoding='utf-8') as f:
+        # 旧的历史导入失败时原样写回，下次启动再导入
+        if self.legacy_clips:
+            settings['clips'] = self.legacy_clips
+        
+        # 先写临时文件再替换，避免多个实例同时退出时写坏文件
+        config_file = config_dir() / 'settings.json'
+        temp_file = config_file.with_name(f'settings.json.{os.getpid()}.tmp')
+        with open(temp_file, 'w', encoding='utf-8') as f:
             json.dump(settings, f)
+        os.replace(temp_file, config_file)
             
     def load_settings(self):
-        config_file = Path.home() / '.clipboard_manager' / 'settings.json'
+        self.init_store()
+        config_file = config_dir() / 'settings.json'
+        settings = {}
         if config_file.exists():
             try:
                 with open(config_file, 'r', encoding='utf-8') as f:
@@ -837,15 +3140,48 @@ class ClipboardManager(QMainWindow):
                     geom.get('height', self.height())
                 )
                 
-                self.clips = settings.get('clips', [])
-                self.filtered_clips = self.clips.copy()
-                self.update_clips_display()
+                self.retention.update(settings.get('retention', {}))
+                self.instant_open_enabled = bool(settings.get('instant_open', False))
+                self.sort_by_rank = bool(settings.get('sort_by_rank', False))
+                self.watchdog_settings.update(settings.get('watchdog', {}))
             except:
                 pass
+        if isinstance(settings, dict):
+            self.import_legacy_clips(settings.get('clips'))
+        self.synced_seq = self.store.max_seq()
+        self.synced_data_version = self.store.data_version()
+        self.search_clips(self.search_input.text())
+                
+    def import_legacy_clips(self, clips):
+        """旧版本把历史保存在 settings.json 中，导入数据库
+
+        导入在一个事务中完成，成功提交之后 save_settings 才不再写回 clips；
+        失败时保留原来的列表，下次启动重试（已导入的相同内容会被跳过）。
+        """
+        self.legacy_clips = None
+        if not isinstance(clips, list) or not clips:
+            return
+        try:
+            with self.store.transaction():
+                for clip in clips:
+                    if isinstance(clip, str):
+                        self.store.add(clip)
+        except sqlite3.Error as e:
+            logger.warning("导入旧版本的剪贴板历史失败，下次启动时重试: %s", e)
+            self.legacy_clips = clips
                 
     def close_application(self):
         # 保存设置
         self.save_settings()
+        self.set_watchdog(False)
+        self.transform_runner.shutdown()
+        self.flush_ingest_queue()
+        if self.classify_worker is not None:
+            self.classify_worker.requestInterruption()
+        for worker in (self.retention_worker, self.count_worker, self.classify_worker):
+            if worker is not None:
+                worker.wait()
+        self.store.close()
         # 退出应用
         QApplication.quit()
 
@@ -854,35 +3190,55 @@ class ClipboardManager(QMainWindow):
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
         
         if self.is_collapsed:
-            # 创建圆形渐变
-            center = self.rect().center()
-            gradient = QRadialGradient(
-                QPointF(center.x(), center.y()),
-                self.collapsed_size.width()/2
-            )
-            gradient.setColorAt(0, QColor(255, 255, 255, 245))
-            gradient.setColorAt(1, QColor(236, 240, 241, 245))
-            
-            painter.setPen(Qt.PenStyle.NoPen)  # 移除边框
-            painter.setBrush(QBrush(gradient))
-            painter.drawEllipse(self.rect())
-            
-            # 绘制图标
-            painter.setPen(QPen(QColor(107, 114, 128)))
-            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "📋")
+            self.paint_float_ball(painter, self.rect())
         else:
-            # 原来的窗口绘制代码
-            gradient = QLinearGradient(0, 0, 0, self.height())
-            gradient.setColorAt(0, QColor(255, 255, 255, 245))
-            gradient.setColorAt(1, QColor(236, 240, 241, 245))
-            
-            painter.setPen(Qt.PenStyle.NoPen)
-            painter.setBrush(QBrush(gradient))
-            painter.drawRoundedRect(self.rect(), 15, 15)
-            
-            painter.setPen(QPen(QColor(189, 195, 199, 100), 1))
-            painter.setBrush(Qt.BrushStyle.NoBrush)
-            painter.drawRoundedRect(self.rect().adjusted(0, 0, -1, -1), 15, 15)
+            self.paint_window_background(painter, self.rect())
+            if self.pending_open is not None and not self.is_animating:
+                self.record_open_latency()
+
+    def paint_float_ball(self, painter, rect):
+        # 创建圆形渐变
+        center = rect.center()
+        gradient = QRadialGradient(
+            QPointF(center.x(), center.y()),
+            self.collapsed_size.width()/2
+        )
+        gradient.setColorAt(0, QColor(255, 255, 255, 245))
+        gradient.setColorAt(1, QColor(236, 240, 241, 245))
+        
+        painter.setPen(Qt.PenStyle.NoPen)  # 移除边框
+        painter.setBrush(QBrush(gradient))
+        painter.drawEllipse(rect)
+        
+        # 绘制图标
+        painter.setPen(QPen(QColor(107, 114, 128)))
+        painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, "📋")
+
+    def paint_window_background(self, painter, rect):
+        # 原来的窗口绘制代码
+        gradient = QLinearGradient(0, 0, 0, rect.height())
+        gradient.setColorAt(0, QColor(255, 255, 255, 245))
+        gradient.setColorAt(1, QColor(236, 240, 241, 245))
+        
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QBrush(gradient))
+        painter.drawRoundedRect(rect, 15, 15)
+        
+        painter.setPen(QPen(QColor(189, 195, 199, 100), 1))
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        painter.drawRoundedRect(rect.adjusted(0, 0, -1, -1), 15, 15)
+
+    def render_float_ball_pixmap(self):
+        """把悬浮球画到截图里，供动画使用"""
+        ratio = self.devicePixelRatioF()
+        pixmap = QPixmap(self.collapsed_size * ratio)
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        self.paint_float_ball(painter, QRect(QPoint(0, 0), self.collapsed_size))
+        painter.end()
+        return pixmap
 
     def check_window_position(self):
         if self.is_collapsed or self.is_animating:  # 在动画过程中不检测
@@ -925,16 +3281,6 @@ class ClipboardManager(QMainWindow):
         if self.is_collapsed:
             return
             
-        self.is_collapsed = True
-        self.is_animating = True
-        self.original_size = self.size()
-        self.original_pos = self.pos()
-        
-        self.central_widget.hide()
-        
-        self.anim = QPropertyAnimation(self, b"geometry")
-        self.anim.setDuration(300)
-        
         screen = QApplication.primaryScreen()
         screen_geometry = screen.availableGeometry()
         current_pos = self.pos()
@@ -955,28 +3301,49 @@ class ClipboardManager(QMainWindow):
                           screen_geometry.bottom() - self.collapsed_size.height() - 5),
                       screen_geometry.top() + 5)
         
+        self.is_collapsed = True
+        self.is_animating = True
+        self.original_size = self.size()
+        self.original_pos = self.pos()
+        
+        # 先截图再隐藏控件，展开时复用这张截图
         start_geometry = self.geometry()
+        self.expanded_snapshot = self.grab()
         end_geometry = QRect(QPoint(int(target_x), int(target_y)), self.collapsed_size)
         
-        self.anim.setStartValue(start_geometry)
-        self.anim.setEndValue(end_geometry)
-        self.anim.setEasingCurve(QEasingCurve.Type.OutQuad)
-        self.anim.finished.connect(lambda: setattr(self, 'is_animating', False))
-        self.anim.start()
+        self.collapsed_to_ball_window = self.instant_open_enabled
+        self.hide()
+        if self.collapsed_to_ball_window:
+            # 快速打开模式：主窗口保持展开状态的大小和布局，只是隐藏，由独立的悬浮球代替
+            self.float_ball.move(end_geometry.topLeft())
+            
+            def animation_finished():
+                self.float_ball.show()
+                self.schedule_prewarm()
+        else:
+            self.central_widget.hide()
+            # 真实窗口只在动画开始时调整一次大小
+            self.setFixedSize(self.collapsed_size)
+            self.move(end_geometry.topLeft())
+            
+            def animation_finished():
+                self.show()
+            
+        self.start_snapshot_animation(self.expanded_snapshot, self.render_float_ball_pixmap(),
+                                      start_geometry, end_geometry, animation_finished)
         
-    def expand_from_float_ball(self):
+    def expand_from_float_ball(self, animate=True, trigger_time=None):
         if not self.is_collapsed:
             return
+        if trigger_time is None:
+            trigger_time = time.perf_counter()
             
         self.is_collapsed = False
-        self.is_animating = True  # 开始动画
-               
-        self.anim = QPropertyAnimation(self, b"geometry")
-        self.anim.setDuration(300)
         
         screen = QApplication.primaryScreen()
         screen_geometry = screen.availableGeometry()
-        current_pos = self.pos()
+        start_geometry = self.float_ball.geometry() if self.collapsed_to_ball_window else self.geometry()
+        current_pos = start_geometry.topLeft()
         
         # 确定展开方向，并远离边缘一定距离
         if current_pos.x() < screen_geometry.center().x():
@@ -984,23 +3351,96 @@ class ClipboardManager(QMainWindow):
         else:
             target_x = screen_geometry.right() - self.original_size.width() - 50  # 增加距离，避免立即触发收缩
             
-        start_geometry = self.geometry()
         end_geometry = QRect(QPoint(target_x, current_pos.y()), self.original_size)
         
-        self.anim.setStartValue(start_geometry)
-        self.anim.setEndValue(end_geometry)
-        self.anim.setEasingCurve(QEasingCurve.Type.OutQuad)
+        if self.is_animating:
+            # 收缩动画还没播完就被打开：丢弃收缩动画和它结束时显示悬浮球的回调
+            self.snapshot_animator.cancel()
+            self.animation_finished_callback = None
+            self.is_animating = False
+        if self.collapsed_to_ball_window:
+            self.float_ball.hide()
+        else:
+            self.hide()
+            self.setFixedSize(self.original_size)
+        self.move(end_geometry.topLeft())
+        
+        if not animate:
+            # 不播放动画，直接显示；快速打开模式下窗口已经提前完成布局和绘制
+            self.pending_open = (trigger_time, 'instant' if self.collapsed_to_ball_window else 'direct')
+            self.show_content()
+            self.show()
+            self.raise_()
+            self.activateWindow()
+            return
+            
+        self.is_animating = True  # 开始动画
+        self.pending_open = (trigger_time, 'animated')
         
         def animation_finished():
-            self.is_animating = False  # 动画结束
             self.show_content()
+            self.show()
+            self.activateWindow()
             
-        self.anim.finished.connect(animation_finished)
-        self.anim.start()
+        self.start_snapshot_animation(self.render_float_ball_pixmap(), self.expanded_snapshot,
+                                      start_geometry, end_geometry, animation_finished)
+        
+    def start_snapshot_animation(self, start_pixmap, end_pixmap, start_geometry, end_geometry, callback):
+        self.animation_finished_callback = callback
+        self.snapshot_animator.start(start_pixmap, end_pixmap, start_geometry, end_geometry, 300)
+        
+    def on_snapshot_animation_finished(self, stats):
+        self.animation_stats.append(stats)
+        logger.debug("动画帧统计: %s", stats)
+        callback = self.animation_finished_callback
+        self.animation_finished_callback = None
+        if callback:
+            callback()
+        self.is_animating = False  # 动画结束
         
     def show_content(self):
         # 显示所有控件
         self.central_widget.show()
+        
+    def set_instant_open(self, enabled):
+        self.instant_open_enabled = bool(enabled)
+        
+    def set_watchdog(self, enabled):
+        """开关卡顿监视；命令行开启只对本次运行有效，设置文件中开启则每次启动都生效"""
+        if enabled and self.watchdog is None:
+            self.watchdog = StallWatchdog(threshold_ms=self.watchdog_settings.get('threshold_ms', 250))
+            self.watchdog.start()
+        elif not enabled and self.watchdog is not None:
+            self.watchdog.stop()
+            self.watchdog = None
+            
+    def set_sort_by_rank(self, enabled):
+        if self.sort_by_rank != bool(enabled):
+            self.sort_by_rank = bool(enabled)
+            self.search_clips(self.search_input.text())
+        
+    def schedule_prewarm(self):
+        if self.is_collapsed and self.collapsed_to_ball_window:
+            self.prewarm_timer.start()
+            
+    def prewarm(self):
+        """快速打开模式下，趁窗口隐藏时提前完成样式、布局和绘制，打开时只需映射窗口"""
+        if not (self.is_collapsed and self.collapsed_to_ball_window):
+            return
+        self.ensurePolished()
+        self.layout.activate()
+        # 离屏绘制一次，预热样式表和字形缓存，同时更新展开动画使用的截图
+        self.expanded_snapshot = self.grab()
+        
+    def record_open_latency(self):
+        trigger_time, mode = self.pending_open
+        self.pending_open = None
+        latency = (time.perf_counter() - trigger_time) * 1000
+        self.open_latencies.append((mode, round(latency, 2)))
+        if mode == 'instant' and latency > OPEN_LATENCY_BUDGET_MS:
+            logger.warning("快速打开耗时 %.1f ms，超过预算 %d ms", latency, OPEN_LATENCY_BUDGET_MS)
+        else:
+            logger.debug("打开窗口 (%s) 耗时 %.1f ms", mode, latency)
 
     def minimize_to_ball(self):
         """直接缩小到悬浮球"""
@@ -1009,15 +3449,27 @@ class ClipboardManager(QMainWindow):
             # 传入 force_right=True 强制收缩到右侧
             self.collapse_to_float_ball(force_right=True)
 
-    def show_window(self):
-        """从托盘显示窗口"""
+    def show_window(self, instant=None):
+        """从托盘显示窗口，instant 为 None 时按是否开启快速打开模式决定是否播放动画"""
+        trigger_time = time.perf_counter()
+        if instant is None:
+            instant = self.instant_open_enabled
         if self.is_collapsed:
-            self.expand_from_float_ball()
-        self.show()
-        self.activateWindow()
+            self.expand_from_float_ball(animate=not instant, trigger_time=trigger_time)
+        elif not self.is_animating:
+            self.show()
+            self.activateWindow()
 
 if __name__ == '__main__':
+    # 打包后的程序中，转换进程池以 spawn 方式启动子进程时需要它
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
+    argv = app.arguments()[1:]
+    args = build_arg_parser().parse_args(argv)
+    # 已经有实例在运行时，把参数转交给它，不再创建第二个窗口和托盘图标
+    if send_ipc_request({'op': 'args', 'argv': argv}) is not None:
+        sys.exit(0)
     window = ClipboardManager()
     window.show()
+    window.handle_args(args)
     sys.exit(app.exec()) 
\ No newline at end of file
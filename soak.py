@@ -0,0 +1,250 @@
+"""长时间运行测试
+
+在 offscreen 平台下反复执行翻页、搜索、添加、删除、右键菜单、确认对话框等操作，
+定期记录存活的 QWidget / QObject 数量、tracemalloc 统计的 Python 内存和进程常驻内存。
+预热期间各项的最小值作为基准，最近几次采样的最小值高出基准超过允许范围时以非零状态退出，
+并打印 tracemalloc 中增长最多的位置。控件和对象数量随当前页的内容上下波动，
+预热期间观察到的波动幅度会计入允许范围。
+
+    python soak.py --duration 3600          # 运行一小时
+    python soak.py --duration 60 --interval 5
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+if not os.environ.get('CLIPBOARD_MANAGER_DIR'):
+    os.environ['CLIPBOARD_MANAGER_DIR'] = tempfile.mkdtemp(prefix='clipboard_soak_')
+
+from PyQt6.QtWidgets import QApplication, QDialog
+from PyQt6.QtCore import QTimer, QObject, QEvent
+
+
+WORDS = ["剪贴板", "history", "测试", "pin", "复制", "alpha", "beta", "页面", "search", "编辑"]
+
+
+class SoakRunner:
+    def __init__(self, app, window, args):
+        self.app = app
+        self.window = window
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.counter = 0
+        self.steps = 0
+        self.samples = []
+        self.warmup_samples = []
+        self.baseline = None
+        self.spread = {}
+        self.baseline_snapshot = None
+        self.failures = []
+        self.start = time.monotonic()
+        self.operations = [
+            (self.search, 4), (self.clear_search, 2), (self.next_page, 4), (self.prev_page, 3),
+            (self.add, 4), (self.delete, 2), (self.pin, 1), (self.flash, 3),
+            (self.context_menu, 1), (self.confirm_delete, 1), (self.edit, 1), (self.select, 1),
+        ]
+        self.weights = [weight for _, weight in self.operations]
+
+    # ---- 操作 ----
+    def items(self):
+        from main import ClipItem
+        return [item for item in self.window.content_widget.findChildren(ClipItem) if item.isVisible()]
+
+    def random_item(self):
+        items = self.items()
+        return self.rng.choice(items) if items else None
+
+    def search(self):
+        self.window.search_input.setText(self.rng.choice(WORDS))
+
+    def clear_search(self):
+        self.window.search_input.setText('')
+
+    def next_page(self):
+        self.window.next_page()
+
+    def prev_page(self):
+        self.window.prev_page()
+
+    def add(self):
+        self.counter += 1
+        words = ' '.join(self.rng.choice(WORDS) for _ in range(self.rng.randint(1, 8)))
+        if self.window.insert_clip(f"{words} #{self.counter}"):
+            self.window.search_clips(self.window.search_input.text())
+
+    def delete(self):
+        item = self.random_item()
+        if item is not None:
+            self.window.delete_clip(item.clip_id)
+
+    def pin(self):
+        item = self.random_item()
+        if item is not None:
+            self.window.pin_clip(item.clip_id, not item.pinned)
+
+    def flash(self):
+        item = self.random_item()
+        if item is not None:
+            item.flash_feedback()
+
+    def select(self):
+        item = self.random_item()
+        if item is not None:
+            self.window.toggle_selection(item.clip_id)
+        if len(self.window.selected_ids) > 5:
+            self.window.clear_selection()
+
+    def close_popup_later(self, accept=False):
+        """菜单和对话框会进入自己的事件循环，稍后自动关闭"""
+        def close():
+            popup = QApplication.activePopupWidget()
+            if popup is not None:
+                popup.close()
+            modal = QApplication.activeModalWidget()
+            if isinstance(modal, QDialog):
+                modal.accept() if accept else modal.reject()
+        QTimer.singleShot(10, close)
+
+    def context_menu(self):
+        item = self.random_item()
+        if item is not None:
+            self.close_popup_later()
+            item.show_context_menu(item.rect().center())
+
+    def confirm_delete(self):
+        item = self.random_item()
+        if item is not None:
+            self.close_popup_later(accept=self.rng.random() < 0.5)
+            item.confirm_delete()
+
+    def edit(self):
+        item = self.random_item()
+        if item is not None and not item.chunked:
+            self.close_popup_later()
+            item.edit_content()
+
+    # ---- 采样 ----
+    def sample(self):
+        # 菜单或对话框打开时处在嵌套的事件循环中，外层 deleteLater 的对象还没销毁，稍后再统计
+        if QApplication.activePopupWidget() is not None or QApplication.activeModalWidget() is not None:
+            QTimer.singleShot(50, self.sample)
+            return
+        QApplication.sendPostedEvents(None, QEvent.Type.DeferredDelete)
+        self.app.processEvents()
+        current, _ = tracemalloc.get_traced_memory()
+        import main
+        sample = {
+            'elapsed': round(time.monotonic() - self.start, 1),
+            'steps': self.steps,
+            'widgets': len(QApplication.allWidgets()),
+            'objects': len(self.window.findChildren(QObject)),
+            'traced_mb': current / 2 ** 20,
+            'rss_mb': (main.process_rss() or 0) / 2 ** 20,
+        }
+        self.samples.append(sample)
+        print(f"[{sample['elapsed']:>8}s] steps {sample['steps']:>8}  widgets {sample['widgets']:>5}  "
+              f"objects {sample['objects']:>5}  traced {sample['traced_mb']:7.2f} MB  rss {sample['rss_mb']:7.1f} MB",
+              flush=True)
+        if self.baseline is None:
+            # 第一次采样在任何操作之前，不计入基准
+            if self.steps:
+                self.warmup_samples.append(sample)
+            if sample['elapsed'] >= self.args.warmup:
+                self.set_baseline()
+        else:
+            self.check(sample)
+
+    def set_baseline(self):
+        window = self.warmup_samples or self.samples[-1:]
+        keys = ('widgets', 'objects', 'traced_mb', 'rss_mb')
+        self.baseline = {key: min(s[key] for s in window) for key in keys}
+        # 翻到满页和空页时控件数量相差二十多个，内存项只看最小值
+        self.spread = {key: max(s[key] for s in window) - self.baseline[key] for key in ('widgets', 'objects')}
+        self.baseline_snapshot = tracemalloc.take_snapshot()
+        print(f"基准（{len(window)} 次采样的最小值）：widgets {self.baseline['widgets']}（波动 {self.spread['widgets']}）  "
+              f"objects {self.baseline['objects']}（波动 {self.spread['objects']}）", flush=True)
+
+    def check(self, sample):
+        limits = [
+            ('widgets', self.args.max_widget_growth),
+            ('objects', self.args.max_object_growth),
+            ('traced_mb', self.args.max_traced_growth_mb),
+            ('rss_mb', self.args.max_rss_growth_mb),
+        ]
+        # 取最近三次采样的最小值：刚刷新的列表可能还有待销毁的条目，持续泄漏会抬高最小值
+        recent = self.samples[-3:]
+        for key, limit in limits:
+            limit += self.spread.get(key, 0)
+            growth = min(s[key] for s in recent) - self.baseline[key]
+            if growth > limit:
+                self.failures.append(f"{key} 增长了 {growth:.2f}（允许 {limit}）")
+        if self.failures:
+            self.report_top_growth()
+            self.app.exit(1)
+
+    def report_top_growth(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        print("tracemalloc 增长最多的位置：")
+        for stat in snapshot.compare_to(self.baseline_snapshot, 'lineno')[:10]:
+            print(f"  {stat}")
+
+    def step(self):
+        if time.monotonic() - self.start >= self.args.duration:
+            self.sample()
+            self.app.exit(1 if self.failures else 0)
+            return
+        operation = self.rng.choices(self.operations, weights=self.weights)[0][0]
+        operation()
+        self.steps += 1
+
+
+def main_entry(argv=None):
+    parser = argparse.ArgumentParser(description="长时间运行测试，检查控件和内存是否持续增长")
+    parser.add_argument('--duration', type=float, default=3600, help="运行的秒数")
+    parser.add_argument('--interval', type=float, default=30, help="采样间隔（秒）")
+    parser.add_argument('--warmup', type=float, default=None, help="预热时间（秒），默认为四个采样间隔")
+    parser.add_argument('--step-ms', type=int, default=2, help="两次操作之间的间隔（毫秒）")
+    parser.add_argument('--max-widget-growth', type=int, default=20)
+    parser.add_argument('--max-object-growth', type=int, default=50)
+    parser.add_argument('--max-traced-growth-mb', type=float, default=8)
+    parser.add_argument('--max-rss-growth-mb', type=float, default=64)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.warmup is None:
+        args.warmup = args.interval * 4
+
+    tracemalloc.start()
+    app = QApplication(sys.argv[:1])
+    import main
+    window = main.ClipboardManager()
+    window.show()
+    # 操作过程中不访问系统剪贴板
+    main.pyperclip.copy = lambda text: None
+
+    runner = SoakRunner(app, window, args)
+    step_timer = QTimer()
+    step_timer.timeout.connect(runner.step)
+    step_timer.start(args.step_ms)
+    sample_timer = QTimer()
+    sample_timer.timeout.connect(runner.sample)
+    sample_timer.start(int(args.interval * 1000))
+    runner.sample()
+    status = app.exec()
+    step_timer.stop()
+    sample_timer.stop()
+    window.close_application()
+
+    if runner.failures:
+        print("失败：" + "；".join(dict.fromkeys(runner.failures)))
+    else:
+        print(f"通过：{runner.steps} 次操作，{len(runner.samples)} 次采样")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main_entry())
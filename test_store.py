@@ -0,0 +1,117 @@
+"""ClipStore 的回归测试
+
+    python -m pytest -q test_store.py
+"""
+from main import ClipStore, classify_text, CLIP_CHUNK_SIZE, VERSION_CHECKPOINT_INTERVAL
+
+
+def test_add_after_purge_is_synced(tmp_path):
+    """清除墓碑后新写入的记录仍然分配比其他实例同步位置更大的 seq"""
+    path = tmp_path / 'clips.db'
+    writer, reader = ClipStore(path), ClipStore(path)
+    try:
+        writer.add('first')
+        second = writer.add('second')
+        writer.delete(second)
+        synced_seq = reader.max_seq()
+        assert synced_seq == 3
+
+        assert writer.compact(grace=-1) == 1
+        third = writer.add('third')
+
+        changes = reader.changes_since(synced_seq)
+        assert [clip_id for clip_id, _, _ in changes] == [third]
+        assert changes[-1][2] > synced_seq
+    finally:
+        writer.close()
+        reader.close()
+
+
+def test_purge_of_unsynced_delete_is_detected(tmp_path):
+    """同步位置早于被清除的墓碑时，purged_seq 会超过同步位置"""
+    path = tmp_path / 'clips.db'
+    writer, reader = ClipStore(path), ClipStore(path)
+    try:
+        first = writer.add('first')
+        synced_seq = reader.max_seq()
+        writer.delete(first)
+        writer.compact(grace=-1)
+
+        assert reader.changes_since(synced_seq) == []
+        assert reader.purged_seq() > synced_seq
+        assert reader.max_seq() >= reader.purged_seq()
+    finally:
+        writer.close()
+        reader.close()
+
+
+def test_classification_of_edited_clip_is_discarded(tmp_path):
+    """分类期间记录被编辑时，旧内容的分类不会写到新内容上"""
+    store = ClipStore(tmp_path / 'clips.db')
+    try:
+        clip_id = store.add('https://example.com')
+        rows = store.unclassified()
+        store.update(clip_id, '{"a": 1}')
+        store.set_kinds([(row_id, digest, classify_text(text)) for row_id, digest, text, _ in rows])
+        assert store.conn.execute('SELECT kind FROM clips WHERE id = ?', (clip_id,)).fetchone()[0] is None
+
+        store.set_kinds([(row_id, digest, classify_text(text)) for row_id, digest, text, _ in store.unclassified()])
+        assert store.conn.execute('SELECT kind FROM clips WHERE id = ?', (clip_id,)).fetchone()[0] == 'json'
+    finally:
+        store.close()
+
+
+def large_text(length):
+    """不重复的大文本，任意一段子串只出现一次"""
+    return ''.join(f'{i:07d},' for i in range(length // 8 + 1))[:length]
+
+
+def test_search_across_short_chunk(tmp_path):
+    """局部修改留下比查询词还短的分块时，跨分块的匹配仍然能找到"""
+    store = ClipStore(tmp_path / 'clips.db')
+    try:
+        text = large_text(300 * 1024)
+        clip_id = store.add(text)
+        new_text = text[:5] + text[CLIP_CHUNK_SIZE:]
+        assert store.update_region(clip_id, 5, CLIP_CHUNK_SIZE, '', ClipStore.digest(new_text))
+        assert store.conn.execute('SELECT MIN(length) FROM clip_chunks WHERE clip_id = ?',
+                                  (clip_id,)).fetchone()[0] == 5
+        assert store.full_text(clip_id) == new_text
+
+        query = new_text[:10]
+        assert [row[0] for row in store.page(query)] == [clip_id]
+        assert store.count(query) == 1
+    finally:
+        store.close()
+
+
+def test_update_region_versions_and_restore(tmp_path):
+    """局部修改超过一个完整版本间隔后，每个历史版本都能还原，恢复后内容和摘要一致"""
+    store = ClipStore(tmp_path / 'clips.db')
+    try:
+        text = large_text(300 * 1024)
+        clip_id = store.add(text)
+        history = [text]
+        for i in range(VERSION_CHECKPOINT_INTERVAL + 4):
+            # 修改区间跨越分块边界，偶尔覆盖一整块
+            length = CLIP_CHUNK_SIZE + 100 if i % 5 == 4 else 3000
+            start = (i * 37 * 1024) % (len(text) - length)
+            end = start + length
+            replacement = f'<edit {i}>' * (i * 50 + 1)
+            text = text[:start] + replacement + text[end:]
+            assert store.update_region(clip_id, start, end, replacement, ClipStore.digest(text))
+            assert store.full_text(clip_id) == text
+            history.append(text)
+
+        versions = [version for version, _ in store.versions(clip_id)]
+        assert versions == list(range(len(history) - 2, -1, -1))
+        for version in versions:
+            assert store.version_text(clip_id, version) == history[version]
+        assert store.version_text(clip_id, len(history) - 1) == text
+
+        assert store.restore_version(clip_id, 3)
+        assert store.full_text(clip_id) == history[3]
+        assert store.find_id(history[3]) == clip_id
+        assert store.version_text(clip_id, len(history) - 1) == history[-1]
+    finally:
+        store.close()